@@ -1,5 +1,15 @@
 """aiolxd core classes & utilities."""
 from .api_object import ApiObject
+from .cache import ResponseCache
 from .client import Client
+from .codec import JsonCodec
+from .codec import get_codec
 from .collection import Collection
 from .end_point import EndPoint
+from .exceptions import DeleteError
+from .exceptions import OperationError
+from .limiter import AdaptiveLimiter
+from .pool import PoolStats
+from .retry import RetryPolicy
+from .scheduler import PriorityScheduler
+from .tracing import Tracer
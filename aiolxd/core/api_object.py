@@ -1,5 +1,12 @@
 """LXD object abstraction end point."""
+from copy import deepcopy
+from http import HTTPStatus
+
 from .end_point import EndPoint
+from .operation import Operation
+
+PATCH = 'patch'
+PUT = 'put'
 
 
 class ApiObject(EndPoint):
@@ -15,25 +22,50 @@ class ApiObject(EndPoint):
 
         # Properties are now written through put here if no exception occured.
 
+    If the object data is already known (for example when it was returned by
+    a collection loaded with recursion), it can be given at construction. The
+    next _load will then use it instead of querying LXD.
+
+    Changes are detected by comparing the object data with a copy taken when
+    it was loaded, so in-place modifications of nested values (like
+    obj.config['key'] = 'value') are saved too. By default, only changed
+    fields are sent with a PATCH request. For dict fields, only changed keys
+    are sent. As PATCH can't remove a key, the whole object is sent with PUT
+    when a field or a dict key was removed.
+
+    The ETag returned by LXD when loading the object is remembered. It's sent
+    in an If-Match header when saving, so the save fails with a 412 error
+    instead of overwriting changes made by someone else since the object was
+    loaded. When the same object is loaded again, it's sent in an
+    If-None-Match header, and LXD answers without a body if the object didn't
+    change.
+
     Members:
         readonly_fields (set): Properties that shouldn't be wrote when object
                                is saved.
+        save_method (str): PATCH to send only changed fields, PUT to always
+                           send the whole object.
 
     """
 
     readonly_fields = {}
+    save_method = PATCH
 
-    def __init__(self, client, url=None):
+    def __init__(self, client, url=None, data=None):
         """Initialize this ApiObject.
 
         Args:
             client (aiolxd.Client): The LXD API client.
             url (str): The url of this endpoint.
+            data (dict): Preloaded object data, if any.
 
         """
         super().__init__(client, url)
-        self._api_data = {}
-        self._is_dirty = False
+        self._is_preloaded = data is not None
+        self._api_data = data if data is not None else {}
+        # Snapshot of the data taken by _load, to detect changes on save.
+        self._saved_data = {}
+        self._etag = None
 
     def __getattr__(self, name):
         """Return a property that was loaded from the LXD API."""
@@ -47,23 +79,92 @@ class ApiObject(EndPoint):
         """
         if name != '_api_data' and '_api_data' in self.__dict__:
             data = self.__dict__['_api_data']
-            if name in data and data[name] != value:
+            if name in data:
                 data[name] = value
-                self._is_dirty = True
                 return
 
         super().__setattr__(name, value)
 
     async def _load(self):
-        self._api_data = await self._query('get')
+        if self._is_preloaded:
+            self._is_preloaded = False
+            self._saved_data = deepcopy(self._api_data)
+            return
+
+        headers = None
+        if self._etag is not None:
+            headers = {'If-None-Match': self._etag}
+
+        operation = Operation(
+            self._client,
+            'get',
+            self.url,
+            None,
+            headers,
+            self.priority
+        )
+        data = await operation
+        self._etag = operation.response.headers.get('ETag')
+        if operation.response.status == HTTPStatus.NOT_MODIFIED:
+            # Drop local changes that weren't saved.
+            self._api_data = deepcopy(self._saved_data)
+            return
+
+        self._api_data = data
+        self._saved_data = deepcopy(self._api_data)
 
     async def _save(self):
-        if not self._is_dirty:
+        saved = self._writable_fields(self._saved_data)
+        current = self._writable_fields(self._api_data)
+        if saved == current:
             return
 
-        writable_data = {}
-        for key, value in self._api_data.items():
-            if key not in self.readonly_fields:
-                writable_data[key] = value
+        changes = None
+        if self.save_method == PATCH:
+            changes = _get_changes(saved, current)
+
+        headers = None
+        if self._etag is not None:
+            headers = {'If-Match': self._etag}
+
+        if changes is not None:
+            await self._query('patch', changes, headers)
+        else:
+            await self._query('put', current, headers)
+
+        # LXD doesn't return the new ETag on writes.
+        self._etag = None
+        self._saved_data = deepcopy(self._api_data)
+
+    def _writable_fields(self, data):
+        return {
+            key: value for key, value in data.items()
+            if key not in self.readonly_fields
+        }
+
+
+def _get_changes(saved, current, nested=True):
+    """Return the fields of current that differ from saved.
+
+    If nested is True, only changed keys of dict fields are returned. Returns
+    None if a key of saved was removed from current, as PATCH can't express
+    it.
+    """
+    if any(key not in current for key in saved):
+        return None
+
+    changes = {}
+    for (key, value) in current.items():
+        if key in saved and saved[key] == value:
+            continue
+
+        saved_value = saved.get(key)
+        both_dicts = isinstance(saved_value, dict) and isinstance(value, dict)
+        if nested and both_dicts:
+            value = _get_changes(saved_value, value, nested=False)
+            if value is None:
+                return None
+
+        changes[key] = value
 
-        await self._query('put', writable_data)
+    return changes
@@ -0,0 +1,129 @@
+"""Client side LXD API response cache."""
+from collections import OrderedDict
+from time import monotonic
+
+# Urls whose responses must never be cached : operation waits and websockets
+# are one shot, and the event stream never ends.
+_UNCACHEABLE_PREFIXES = (
+    '/1.0/events',
+    '/1.0/operations',
+)
+
+
+class ResponseCache:
+    """LRU cache of LXD API GET responses.
+
+    Responses are kept at most ttl seconds, and the least recently used ones
+    are evicted when there are more than max_entries of them, or when their
+    bodies take more than max_bytes. Raw bodies are stored, so each hit
+    returns a freshly decoded object that can be modified freely.
+
+    Any mutating request (PUT, PATCH, POST, DELETE) sent through the client
+    invalidates the cached responses of the target url and of its parents,
+    whatever their query string. For example, a PUT on
+    /1.0/containers/web1/state invalidates /1.0/containers/web1 and
+    /1.0/containers?recursion=1.
+
+    Members:
+        hits (int): Number of requests answered from the cache.
+        misses (int): Number of cacheable requests not found in the cache.
+
+    """
+
+    def __init__(self, ttl=1.0, max_entries=1024, max_bytes=None):
+        """Initialize the cache.
+
+        Args:
+            ttl (float): Time in seconds a response is kept.
+            max_entries (int): Maximum number of cached responses.
+            max_bytes (int): Maximum total size of cached bodies, None for no
+                             limit.
+
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        """Return the number of cached responses."""
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Return the total size of cached bodies, in bytes."""
+        return self._bytes
+
+    def get(self, url):
+        """Return the cached (status, headers, body) of url, or None."""
+        if not _is_cacheable(url):
+            return None
+
+        entry = self._entries.get(url)
+        if entry is not None and entry[0] < monotonic():
+            self._remove(url)
+            entry = None
+
+        if entry is None:
+            self.misses = self.misses + 1
+            return None
+
+        self._entries.move_to_end(url)
+        self.hits = self.hits + 1
+        return entry[1:]
+
+    def put(self, url, status, headers, body):
+        """Cache the response of a GET request on url."""
+        if status != 200 or not _is_cacheable(url):
+            return
+
+        if self.max_bytes is not None and len(body) > self.max_bytes:
+            return
+
+        if url in self._entries:
+            self._remove(url)
+
+        expires = monotonic() + self.ttl
+        self._entries[url] = (expires, status, headers, body)
+        self._bytes = self._bytes + len(body)
+
+        while self._is_full():
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, url):
+        """Drop cached responses of url and of all its parents."""
+        path = _get_path(url)
+        invalidated = set()
+        while path:
+            invalidated.add(path)
+            path = path.rsplit('/', 1)[0]
+
+        for cached_url in list(self._entries):
+            if _get_path(cached_url) in invalidated:
+                self._remove(cached_url)
+
+    def clear(self):
+        """Drop all cached responses."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def _is_full(self):
+        if len(self._entries) > self.max_entries:
+            return True
+
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _remove(self, url):
+        entry = self._entries.pop(url)
+        self._bytes = self._bytes - len(entry[3])
+
+
+def _get_path(url):
+    return url.split('?', 1)[0].rstrip('/')
+
+
+def _is_cacheable(url):
+    return not url.startswith(_UNCACHEABLE_PREFIXES)
@@ -1,84 +1,426 @@
 """HTTP client class & related utilities."""
+from asyncio import Future
+from asyncio import ensure_future
+from asyncio import get_event_loop
+from asyncio import shield
+from asyncio import sleep
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Tuple
 
+from aiohttp import BaseConnector
 from aiohttp import ClientSession
+from aiohttp import ClientWebSocketResponse
 from aiohttp import TCPConnector
-from json import dumps
-from json import loads
+from aiohttp import UnixConnector
 from pathlib import Path
 from ssl import CERT_NONE
 from ssl import SSLContext
 
-from aiolxd.core.config import Config
+from aiolxd.core.cache import ResponseCache
+from aiolxd.core.codec import CodecStats
+from aiolxd.core.codec import JsonCodec
+from aiolxd.core.codec import get_codec
+from aiolxd.core.events import DROP_OLDEST
+from aiolxd.core.events import EventStream
+from aiolxd.core.events import EventSubscription
+from aiolxd.core.events import OperationWaiter
+from aiolxd.core.limiter import AdaptiveLimiter
+from aiolxd.core.pool import PoolStats
+from aiolxd.core.retry import RetryPolicy
+from aiolxd.core.scheduler import NORMAL
+from aiolxd.core.scheduler import PriorityScheduler
+from aiolxd.core.tracing import Tracer
 from aiolxd.end_points.api import Api
 
+UNIX_SCHEME = 'unix://'
+
+# Default locations of the LXD daemon socket, in lookup order.
+LXD_UNIX_SOCKETS = (
+    Path('/var/snap/lxd/common/lxd/unix.socket'),
+    Path('/var/lib/lxd/unix.socket'),
+)
+
+# Methods whose concurrent identical requests are sent only once.
+_IDEMPOTENT_METHODS = ('get', 'head')
+
+# Host name used in urls sent through the unix socket. LXD ignores it, but
+# aiohttp needs a well-formed url.
+_UNIX_BASE_URL = 'http://lxd'
+
+
+class ApiResponse:
+    """A decoded LXD API response.
+
+    Members:
+        status (int): HTTP status code.
+        headers (Mapping): HTTP response headers.
+        data (object): Decoded JSON body, None if the response had no body,
+                       as with 304 Not Modified responses.
+
+    """
+
+    def __init__(
+        self,
+        status: int,
+        headers: Mapping[str, str],
+        data: Any
+    ) -> None:
+        """Initialize the response."""
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+
+def find_local_socket() -> Path:
+    """Return the path of the local LXD daemon unix socket.
+
+    Raises:
+        FileNotFoundError: If no LXD socket was found at the usual locations.
+
+    """
+    for socket_path in LXD_UNIX_SOCKETS:
+        if socket_path.exists():
+            return socket_path
+
+    raise FileNotFoundError(
+        'No LXD unix socket found in %s' %
+        ', '.join(str(it) for it in LXD_UNIX_SOCKETS)
+    )
+
 
 class Client:
-    """The LXD HTTP client."""
+    """The LXD HTTP client.
+
+    The client talks to LXD either over HTTPS, or directly over the daemon
+    unix socket when base_url uses the unix:// scheme, i.e :
+        Client('unix:///var/lib/lxd/unix.socket')
+
+    A bare 'unix://' base url will use the first socket found in
+    LXD_UNIX_SOCKETS. Going through the unix socket skips TCP and the TLS
+    handshake entirely, and is the preferred transport for a controller
+    running on the LXD host.
+    """
 
     def __init__(
         self,
         base_url: str,
         verify_host_certificate: bool = True,
         client_key: Optional[Path] = None,
-        client_cert: Optional[Path] = None
+        client_cert: Optional[Path] = None,
+        operation_events: bool = False,
+        cache: Optional[ResponseCache] = None,
+        codec: Optional[JsonCodec] = None,
+        offload_threshold: Optional[int] = 2 ** 20,
+        executor: Optional[Executor] = None,
+        pool_size: int = 100,
+        pool_size_per_host: int = 0,
+        keepalive_timeout: float = 15.0,
+        dns_cache_ttl: Optional[int] = 10,
+        tracer: Optional[Tracer] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+        retry: Optional[RetryPolicy] = None
     ) -> None:
         """Initialize the client.
 
         Args:
-            base_url: Base LXD API url.
+            base_url: Base LXD API url, or unix://<socket path>.
             verify_host_certificate: Weither to authenticate LXD host or not.
             client_key: Client certificate key path.
             client_cert: Client certificate cert path.
+            operation_events: If True, background operations are waited using
+                              a single /1.0/events websocket shared by all
+                              operations, instead of one /wait request each.
+                              The /wait endpoint is still used when the events
+                              websocket is unavailable.
+            cache: Cache used for GET responses, None to disable caching.
+            codec: JSON codec used for requests, responses and events. If
+                   None, the fastest installed one is used (see
+                   aiolxd.core.codec).
+            offload_threshold: Size in bytes above which response bodies are
+                               decoded in executor instead of on the event
+                               loop, None to always decode on the loop.
+            executor: Executor decoding big bodies, None for the loop default
+                      thread pool. A ProcessPoolExecutor can be used with
+                      pure-Python codecs, that hold the GIL while decoding.
+            pool_size: Maximum number of simultaneous connections, 0 for no
+                       limit. Each pending background operation holds one
+                       while waiting on /wait, unless operation_events is
+                       enabled.
+            pool_size_per_host: Maximum number of simultaneous connections to
+                                the same host, 0 for no limit.
+            keepalive_timeout: Time in seconds idle connections are kept open
+                               for reuse.
+            dns_cache_ttl: Time in seconds resolved host names are cached,
+                           None to cache them forever.
+            tracer: Tracer recording requests and operations spans and
+                    metrics, None to disable tracing.
+            limiter: Limiter adjusting the number of requests in flight to
+                     the daemon load, None to send requests right away.
+            scheduler: Scheduler sending pending requests by priority, None
+                       to send them in arrival order.
+            retry: Policy retrying idempotent requests on transient errors,
+                   None to fail on the first error.
+
+        Concurrent identical GET requests are always coalesced : only one is
+        sent to LXD, and its response is shared by all callers.
 
         """
-        self._base_url = base_url
+        (self._base_url, unix_socket) = self._parse_base_url(base_url)
+        self._client_cert = client_cert
+        self._cache = cache
+        self._codec = codec if codec is not None else get_codec()
+        self._codec_stats = CodecStats()
+        self._offload_threshold = offload_threshold
+        self._executor = executor
+        self._in_flight: Dict[Tuple[Any, ...], 'Future[Any]'] = {}
         connector = self._get_connector(
             verify_host_certificate=verify_host_certificate,
             client_key=client_key,
-            client_cert=client_cert
+            client_cert=client_cert,
+            unix_socket=unix_socket,
+            pool_size=pool_size,
+            pool_size_per_host=pool_size_per_host,
+            keepalive_timeout=keepalive_timeout,
+            dns_cache_ttl=dns_cache_ttl
         )
+        self._pool_stats = PoolStats(connector)
+        self._tracer = tracer
+        self._limiter = limiter
+        self._scheduler = scheduler
+        self._retry = retry
         self._session = self._get_session(connector)
+        self._event_stream = EventStream(self)
+        self._operation_waiter: Optional[OperationWaiter] = None
+        if operation_events:
+            self._operation_waiter = OperationWaiter(self)
 
     @property
     def api(self) -> Api:
         """Return the api root endpoint."""
         return Api(self)
 
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        """Return the GET response cache, if enabled."""
+        return self._cache
+
+    @property
+    def codec(self) -> JsonCodec:
+        """Return the JSON codec."""
+        return self._codec
+
+    @property
+    def codec_stats(self) -> CodecStats:
+        """Return the JSON decoding statistics."""
+        return self._codec_stats
+
+    @property
+    def pool_stats(self) -> PoolStats:
+        """Return the connection pool metrics."""
+        return self._pool_stats
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        """Return the tracer, if tracing is enabled."""
+        return self._tracer
+
+    @property
+    def limiter(self) -> Optional[AdaptiveLimiter]:
+        """Return the concurrency limiter, if enabled."""
+        return self._limiter
+
+    @property
+    def scheduler(self) -> Optional[PriorityScheduler]:
+        """Return the priority scheduler, if enabled."""
+        return self._scheduler
+
+    @property
+    def retry(self) -> Optional[RetryPolicy]:
+        """Return the retry policy, if enabled."""
+        return self._retry
+
+    @property
+    def operation_waiter(self) -> Optional[OperationWaiter]:
+        """Return the operation events waiter, if enabled."""
+        return self._operation_waiter
+
+    @property
+    def client_cert(self) -> Optional[Path]:
+        """Return the client certificate path, if any."""
+        return self._client_cert
+
+    def events(
+        self,
+        types: Optional[List[str]] = None,
+        queue_size: int = 1024,
+        policy: str = DROP_OLDEST
+    ) -> EventSubscription:
+        """Subscribe to LXD events.
+
+        All subscriptions of a client share a single /1.0/events websocket,
+        which reconnects automatically if the connection is lost. See
+        aiolxd.core.events.EventSubscription for usage.
+
+        Args:
+            types: Event types to receive (logging, operation, lifecycle), or
+                   None to receive all events.
+            queue_size: Maximum number of events buffered for this subscriber.
+            policy: What to do when the subscriber queue is full, one of
+                    DROP_OLDEST, DROP_NEWEST or BLOCK (see aiolxd.core.events).
+
+        """
+        return self._event_stream.subscribe(types, queue_size, policy)
+
     async def connect_websocket(
         self,
         operation_id: str,
         secret: str
-    ):
+    ) -> ClientWebSocketResponse:
         """Connect to an operation websocket."""
-        url_format = '{base_url}/1.0/operations/{id}/websocket?secret={secret}'
-        url = url_format.format(
-            base_url=self.config.base_url,
+        url = '/1.0/operations/{id}/websocket?secret={secret}'.format(
             id=operation_id,
             secret=secret
         )
-        return await self._session.ws_connect(url)
+        return await self.ws_connect(url)
 
-    async def query(self, method, url, data=None):
+    async def ws_connect(self, url: str) -> ClientWebSocketResponse:
+        """Open a websocket on the given api url."""
+        return await self._session.ws_connect(self._get_url(url))
+
+    async def query(self, method, url, data=None, headers=None,
+                    priority=NORMAL):
         """Query the lxd api.
 
         Args:
             url (str): The relative url to query.
             method (str): HTTP method to use.
             data (Object): Data as a python object to send with the request.
+            headers (dict): Additional HTTP headers to send.
+            priority (int): Priority class of the request, see
+                            aiolxd.core.scheduler.
 
         """
-        url = self._get_url(url)
-        json_data = None
-        if data is not None:
-            json_data = dumps(data)
+        response = await self.request(method, url, data, headers, priority)
+        return response.data
+
+    async def request(self, method, url, data=None, headers=None,
+                      priority=NORMAL):
+        """Query the lxd api, returning the response status and headers too.
+
+        Args:
+            url (str): The relative url to query.
+            method (str): HTTP method to use.
+            data (Object): Data as a python object to send with the request.
+            headers (dict): Additional HTTP headers to send.
+            priority (int): Priority class of the request, see
+                            aiolxd.core.scheduler.
+
+        """
+        method = method.lower()
+        if method in _IDEMPOTENT_METHODS:
+            cached = None
+            # Only GET responses are cached, a HEAD response has no body.
+            if self._cache is not None and method == 'get':
+                cached = self._cache.get(url)
+            if cached is None:
+                cached = await self._coalesce(method, url, headers, priority)
+            return await self._get_response(*cached)
+
+        (status, response_headers, body) = await self._send(
+            method,
+            url,
+            data,
+            headers,
+            priority
+        )
+        self.invalidate(url)
+        return await self._get_response(status, response_headers, body)
 
-        request = self._session.request(method, url, data=json_data)
-        async with request as response:
-            body = await response.read()
-            json = body.decode('utf-8')
+    async def download(
+        self,
+        url: str,
+        chunk_size: int = 2 ** 16,
+        headers: Optional[Dict[str, str]] = None,
+        priority: int = NORMAL
+    ) -> AsyncIterator[bytes]:
+        """Yield the raw body of a GET request on url, chunk by chunk.
+
+        The body is neither decoded nor buffered, nor cached, so big files and
+        logs can be read with bounded memory. The scheduler and limiter slot
+        is released once the response headers are received : the body is
+        read at the pace of the consumer, which must neither hold other
+        requests back nor count as daemon latency.
+
+        Args:
+            url: The relative url to query.
+            chunk_size: Maximum size of yielded chunks.
+            headers: Additional HTTP headers to send.
+            priority: Priority class of the request, see
+                      aiolxd.core.scheduler.
+
+        """
+        async with self._slot('get', url, priority):
+            response = await self._session.get(
+                self._get_url(url),
+                headers=headers
+            )
+            # Releases the connection on errors.
             response.raise_for_status()
-            return loads(json)
+
+        async with response:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    async def upload(
+        self,
+        url: str,
+        body: Any,
+        headers: Optional[Dict[str, str]] = None,
+        priority: int = NORMAL
+    ) -> ApiResponse:
+        """Send a raw body with a POST request on url.
+
+        body is sent as is, without JSON encoding. It can be bytes, a file
+        object or an asynchronous iterable of bytes-like chunks, which is
+        streamed without being buffered.
+
+        Args:
+            url: The relative url to query.
+            body: Data to send.
+            headers: Additional HTTP headers to send.
+            priority: Priority class of the request, see
+                      aiolxd.core.scheduler.
+
+        """
+        async with self._slot('post', url, priority):
+            request = self._session.post(
+                self._get_url(url),
+                data=body,
+                headers=headers
+            )
+            async with request as response:
+                response_body = await response.read()
+                response.raise_for_status()
+        self.invalidate(url)
+        return await self._get_response(
+            response.status,
+            response.headers,
+            response_body
+        )
+
+    def invalidate(self, url: str) -> None:
+        """Drop cached responses of an url and of its parents, if caching."""
+        if self._cache is not None:
+            self._cache.invalidate(url)
 
     async def __aenter__(self) -> 'Client':
         """Enter the client context."""
@@ -90,19 +432,47 @@ class Client:
 
         Will release the aiohttp ClientSession.
         """
+        await self._event_stream.close()
+        if self._operation_waiter is not None:
+            await self._operation_waiter.close()
         return await self._session.__aexit__(
             exception_type,
             exception,
             traceback
         )
 
+    @staticmethod
+    def _parse_base_url(base_url: str) -> Tuple[str, Optional[Path]]:
+        """Split base_url in the http base url and an unix socket path."""
+        if not base_url.startswith(UNIX_SCHEME):
+            return (base_url, None)
+
+        socket_path = base_url[len(UNIX_SCHEME):]
+        if socket_path:
+            return (_UNIX_BASE_URL, Path(socket_path))
+
+        return (_UNIX_BASE_URL, find_local_socket())
+
     @staticmethod
     def _get_connector(
         verify_host_certificate: bool,
         client_key: Optional[Path],
-        client_cert: Optional[Path]
-    ) -> TCPConnector:
-        """Return an aiohttp ClientSession based on the options."""
+        client_cert: Optional[Path],
+        unix_socket: Optional[Path] = None,
+        pool_size: int = 100,
+        pool_size_per_host: int = 0,
+        keepalive_timeout: float = 15.0,
+        dns_cache_ttl: Optional[int] = 10
+    ) -> BaseConnector:
+        """Return an aiohttp connector based on the options."""
+        pool_options = {
+            'limit': pool_size,
+            'limit_per_host': pool_size_per_host,
+            'keepalive_timeout': keepalive_timeout,
+        }
+        if unix_socket is not None:
+            return UnixConnector(path=str(unix_socket), **pool_options)
+
         ssl_context = SSLContext()
 
         if not verify_host_certificate:
@@ -114,12 +484,149 @@ class Client:
         if cert is not None:
             ssl_context.load_cert_chain(cert, key)
 
-        return TCPConnector(ssl=ssl_context)
+        return TCPConnector(
+            ssl=ssl_context,
+            ttl_dns_cache=dns_cache_ttl,
+            **pool_options
+        )
 
-    def _get_session(self, connector: TCPConnector) -> ClientSession:
+    def _get_session(self, connector: BaseConnector) -> ClientSession:
+        trace_configs = [self._pool_stats.trace_config()]
+        if self._tracer is not None:
+            trace_configs.append(self._tracer.trace_config())
         return ClientSession(
             connector=connector,
+            trace_configs=trace_configs,
+        )
+
+    async def _coalesce(self, method, url, headers, priority):
+        """Send an idempotent request, sharing it with identical ones.
+
+        Concurrent identical requests are only sent once. The raw response is
+        shared, and each caller decodes its own copy of the body, so callers
+        can modify the returned data without affecting each other. The shared
+        request is scheduled with the priority of the first caller.
+        """
+        key = (method, url, tuple(sorted(headers.items())) if headers else ())
+        fetch = self._in_flight.get(key)
+        if fetch is None:
+            fetch = ensure_future(
+                self._fetch(method, url, headers, priority)
+            )
+            self._in_flight[key] = fetch
+
+            def _on_done(_):
+                if self._in_flight.get(key) is fetch:
+                    del self._in_flight[key]
+                # Avoid never retrieved exception warnings if all callers
+                # were cancelled.
+                if not fetch.cancelled():
+                    fetch.exception()
+
+            fetch.add_done_callback(_on_done)
+
+        # Shielded, so cancelling one caller doesn't cancel the others.
+        return await shield(fetch)
+
+    async def _fetch(self, method, url, headers, priority):
+        response = await self._send(method, url, None, headers, priority)
+        if self._cache is not None and method == 'get':
+            self._cache.put(url, *response)
+        return response
+
+    async def _send(self, method, url, data, headers, priority=NORMAL):
+        json_data = None
+        if data is not None:
+            json_data = self._codec.dumps(data)
+
+        retry = self._retry
+        if retry is None or not retry.applies(method):
+            return await self._schedule(method, url, json_data, headers,
+                                        priority)
+
+        retry.on_request()
+        attempt = 1
+        while True:
+            try:
+                return await self._schedule(method, url, json_data, headers,
+                                            priority)
+            except Exception as error:  # pylint: disable=broad-except
+                delay = retry.get_delay(attempt, error)
+                if delay is None:
+                    raise
+            attempt = attempt + 1
+            await sleep(delay)
+
+    async def _schedule(self, method, url, json_data, headers, priority):
+        async with self._slot(method, url, priority):
+            return await self._request(method, url, json_data, headers)
+
+    @asynccontextmanager
+    async def _slot(self, method, url, priority):
+        """Wait until the scheduler and the limiter let a request be sent."""
+        if self._scheduler is None:
+            async with self._limit(method, url, priority):
+                yield
+            return
+
+        async with self._scheduler.slot(url, priority):
+            async with self._limit(method, url, priority):
+                yield
+
+    @asynccontextmanager
+    async def _limit(self, method, url, priority):
+        if self._limiter is None:
+            yield
+            return
+
+        async with self._limiter.slot(method, url, priority):
+            yield
+
+    async def _request(self, method, url, json_data, headers):
+        # Receives the tracer span, finished once the body was read.
+        trace = {}
+        request = self._session.request(
+            method,
+            self._get_url(url),
+            data=json_data,
+            headers=headers,
+            trace_request_ctx=trace
         )
+        try:
+            async with request as response:
+                body = await response.read()
+                response.raise_for_status()
+                return (response.status, response.headers, body)
+        finally:
+            span = trace.get('span')
+            if span is not None:
+                span.finish()
+
+    async def _get_response(self, status, headers, body):
+        json = None
+        if body:
+            json = await self._decode(body)
+        return ApiResponse(status, headers, json)
+
+    async def _decode(self, body):
+        """Decode a body, in the executor if it's bigger than the threshold.
+
+        Decoding a multi-megabyte body blocks the event loop for tens of
+        milliseconds, stalling every websocket reader meanwhile.
+        """
+        threshold = self._offload_threshold
+        if threshold is not None and len(body) > threshold:
+            self._codec_stats.add_offloaded(len(body))
+            return await get_event_loop().run_in_executor(
+                self._executor,
+                self._codec.loads,
+                body
+            )
+
+        start = perf_counter()
+        json = self._codec.loads(body)
+        self._codec_stats.add_inline(perf_counter() - start)
+        return json
 
     def _get_url(self, endpoint):
         return '%s%s' % (self._base_url, endpoint)
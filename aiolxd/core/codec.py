@@ -0,0 +1,151 @@
+"""Pluggable JSON codecs, encoding to and decoding from bytes."""
+import json
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+class JsonCodec:
+    """Encode and decode LXD API JSON payloads.
+
+    Bodies are encoded directly to bytes, and decoded directly from bytes,
+    without an intermediate str copy when the underlying library allows it.
+    Subclasses implement dumps and loads.
+
+    Members:
+        name (str): Name of the codec.
+
+    """
+
+    name = ''
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode data to JSON bytes."""
+        raise NotImplementedError()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Decode JSON bytes or str."""
+        raise NotImplementedError()
+
+
+class StdlibCodec(JsonCodec):
+    """Codec based on the standard library json module."""
+
+    name = 'json'
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode data to JSON bytes."""
+        return json.dumps(data).encode('utf-8')
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Decode JSON bytes or str."""
+        # json.loads detects the encoding of bytes itself.
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec based on orjson, the fastest one when installed."""
+
+    name = 'orjson'
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode data to JSON bytes."""
+        return orjson.dumps(data)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Decode JSON bytes or str."""
+        return orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    """Codec based on ujson."""
+
+    name = 'ujson'
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode data to JSON bytes."""
+        return ujson.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Decode JSON bytes or str."""
+        return ujson.loads(data)
+
+
+class CodecStats:
+    """Statistics of the JSON decoding done by a client.
+
+    Members:
+        inline (int): Number of bodies decoded on the event loop.
+        offloaded (int): Number of bodies decoded in the executor.
+        offloaded_bytes (int): Total size of bodies decoded in the executor.
+        blocked_time (float): Total time in seconds the event loop was blocked
+                              decoding bodies.
+        max_blocked_time (float): Longest time in seconds the event loop was
+                                  blocked decoding a single body.
+
+    """
+
+    def __init__(self):
+        """Initialize the statistics."""
+        self.inline = 0
+        self.offloaded = 0
+        self.offloaded_bytes = 0
+        self.blocked_time = 0.0
+        self.max_blocked_time = 0.0
+
+    def add_inline(self, duration):
+        """Record a body decoded on the event loop in duration seconds."""
+        self.inline = self.inline + 1
+        self.blocked_time = self.blocked_time + duration
+        self.max_blocked_time = max(self.max_blocked_time, duration)
+
+    def add_offloaded(self, size):
+        """Record a body of size bytes decoded in the executor."""
+        self.offloaded = self.offloaded + 1
+        self.offloaded_bytes = self.offloaded_bytes + size
+
+
+_CODECS: Dict[str, Callable[[], JsonCodec]] = {
+    'json': StdlibCodec,
+}
+
+if orjson is not None:
+    _CODECS['orjson'] = OrjsonCodec
+
+if ujson is not None:
+    _CODECS['ujson'] = UjsonCodec
+
+# Lookup order when no codec is explicitly requested.
+_PREFERRED_CODECS = ('orjson', 'ujson', 'json')
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """Return a JSON codec.
+
+    Args:
+        name: Name of the codec, json, orjson or ujson. If None, the fastest
+              installed one is returned.
+
+    Raises:
+        ValueError: If the requested codec is unknown or not installed.
+
+    """
+    if name is None:
+        name = next(it for it in _PREFERRED_CODECS if it in _CODECS)
+
+    if name not in _CODECS:
+        raise ValueError('JSON codec %s is not available' % name)
+
+    return _CODECS[name]()
@@ -1,6 +1,19 @@
 """Collection endpoint module."""
+from asyncio import FIRST_COMPLETED
+from asyncio import Semaphore
+from asyncio import ensure_future
+from asyncio import gather
+from asyncio import wait
+from functools import partial
+from sys import exc_info
+from tempfile import SpooledTemporaryFile
+
 from .end_point import EndPoint
 from .api_object import ApiObject
+from .exceptions import DeleteError
+from .exceptions import OperationError
+from .json_stream import JsonArrayParser
+from .operation import Operation
 
 
 class Collection(EndPoint):
@@ -13,25 +26,50 @@ class Collection(EndPoint):
 
     See api.certificates or api.containers for an example.
 
+    When recursion is greater than 0, the collection is loaded with
+    ?recursion=N, and LXD returns the children data instead of their urls.
+    Children are then built from this data, without issuing a GET for each
+    of them. The preloaded data of a child is handed to the first child object
+    created for it, later accesses will query LXD again.
+
+    Children deleted with del are removed concurrently at the next save, at
+    most delete_concurrency at a time. If some deletions fail, the other ones
+    are still applied, and a DeleteError listing the failures is raised.
+
     Members:
         child_class : Class Class of children that must be created. The LXD
-                      client and the child url will be passed in the
-                      constructor.
+                      client, the child url and the preloaded child data will
+                      be passed in the constructor.
+        child_key (str): Field of the child data holding the child name, used
+                         to build child urls from recursive listings.
+        recursion (int): Recursion level used when loading the collection.
+        delete_concurrency (int): Maximum number of deletions running at once.
 
     """
 
     child_class = ApiObject
+    child_key = 'name'
+    recursion = 0
+    delete_concurrency = 10
 
-    def __init__(self, client, url=None):
+    def __init__(self, client, url=None, recursion=None,
+                 delete_concurrency=None):
         """Initialize this collection.
 
         Args:
             client (aiolxd.Client): The LXD API client.
             url (str): The url of this endpoint.
+            recursion (int): Overrides the class recursion level.
+            delete_concurrency (int): Overrides the class delete concurrency.
 
         """
         super().__init__(client, url)
+        if recursion is not None:
+            self.recursion = recursion
+        if delete_concurrency is not None:
+            self.delete_concurrency = delete_concurrency
         self._children = []
+        self._preloaded = {}
         self._deleted_children = []
 
     def __len__(self):
@@ -50,7 +88,7 @@ class Collection(EndPoint):
         child_url = self._child_url(key)
         if child_url not in self._children:
             raise IndexError()
-        return self.child_class(self._client, child_url)
+        return self._get_child(child_url)
 
     def __delitem__(self, key):
         """Schedule a children for deletion.
@@ -63,6 +101,7 @@ class Collection(EndPoint):
         if child_url not in self._children:
             raise IndexError()
         self._children.remove(child_url)
+        self._preloaded.pop(child_url, None)
         self._deleted_children.append(child_url)
 
     def __contains__(self, key):
@@ -73,17 +112,177 @@ class Collection(EndPoint):
     async def __aiter__(self):
         """Asynchronous iteration on children method."""
         for url in self._children:
-            async with self.child_class(self._client, url) as child:
+            async with self._get_child(url) as child:
                 yield child
 
+    async def iter(self, concurrency=1, ordered=True):
+        """Iterate on children, loading up to concurrency of them at once.
+
+        Children are loaded ahead of the consumer, so iterating costs the
+        latency of the slowest of concurrency loads instead of their sum. Each
+        child is saved when the consumer moves on to the next one, like with
+        async for on the collection. Loads still in flight are cancelled if the
+        iteration is interrupted.
+
+        Args:
+            concurrency (int): Maximum number of children loaded in advance.
+            ordered (bool): If False, children are yielded as soon as they are
+                            loaded instead of in collection order.
+
+        """
+        urls = list(self._children)
+        next_url = 0
+        window = []
+
+        def _fill_window():
+            nonlocal next_url
+            while len(window) < concurrency and next_url < len(urls):
+                load = ensure_future(self._load_child(urls[next_url]))
+                window.append(load)
+                next_url = next_url + 1
+
+        try:
+            _fill_window()
+            while window:
+                if ordered:
+                    load = window.pop(0)
+                else:
+                    (done, _) = await wait(window, return_when=FIRST_COMPLETED)
+                    load = done.pop()
+                    window.remove(load)
+
+                child = await load
+                _fill_window()
+
+                try:
+                    yield child
+                except BaseException:
+                    await child.__aexit__(*exc_info())
+                    raise
+                await child.__aexit__(None, None, None)
+        finally:
+            for load in window:
+                load.cancel()
+            await gather(*window, return_exceptions=True)
+
+    async def stream(self, chunk_size=2 ** 16, spool_size=2 ** 22):
+        """Iterate on children of a collection listing, parsed incrementally.
+
+        The listing is parsed chunk by chunk, and each child is yielded as
+        soon as its data was parsed, so peak memory is proportional to a
+        single child instead of the whole listing. It's meant for huge
+        collections loaded with recursion : the listing is queried by this
+        call, the collection doesn't need to be loaded, and isn't updated.
+
+        The listing is received before the first child is yielded, spooled to
+        a temporary file once bigger than spool_size bytes : children may send
+        requests, which mustn't wait for the listing connection and its
+        scheduler or limiter slot to be released.
+
+        Like with async for on the collection, each child is saved when the
+        consumer moves on to the next one.
+
+        Args:
+            chunk_size (int): Maximum size of the body chunks read at once.
+            spool_size (int): Size in bytes above which the listing is
+                              written to a temporary file.
+
+        """
+        with SpooledTemporaryFile(max_size=spool_size) as spool:
+            async for chunk in self._client.download(self._listing_url(),
+                                                     chunk_size,
+                                                     priority=self.priority):
+                spool.write(chunk)
+            spool.seek(0)
+
+            parser = JsonArrayParser('metadata')
+            codec = self._client.codec
+            for chunk in iter(partial(spool.read, chunk_size), b''):
+                for item in parser.feed(chunk):
+                    (url, data) = self._split_child(codec.loads(item))
+                    async with self._make_child(url, data) as child:
+                        yield child
+
     async def _load(self):
-        self._children = await self._query('get')
-        print(self._children)
+        url = self._listing_url()
+        children = await Operation(
+            self._client,
+            'get',
+            url,
+            None,
+            priority=self.priority
+        )
+
+        self._children = []
+        self._preloaded = {}
+        for child in children:
+            (child_url, data) = self._split_child(child)
+            self._children.append(child_url)
+            if data is not None:
+                self._preloaded[child_url] = data
 
     async def _save(self):
-        for child in self._deleted_children:
-            await self._client.query('delete', child, {})
+        deleted = self._deleted_children
         self._deleted_children = []
+        if not deleted:
+            return
+
+        semaphore = Semaphore(self.delete_concurrency)
+
+        async def _delete(url):
+            async with semaphore:
+                result = await Operation(
+                    self._client,
+                    'delete',
+                    url,
+                    {},
+                    priority=self.priority
+                )
+
+            # Background deletions report failures in their final status.
+            if isinstance(result, dict):
+                if result.get('status_code', 200) >= 400:
+                    raise OperationError(result)
+
+        results = await gather(
+            *[_delete(it) for it in deleted],
+            return_exceptions=True
+        )
+
+        failures = {}
+        for (url, result) in zip(deleted, results):
+            if isinstance(result, BaseException):
+                failures[url] = result
+
+        if failures:
+            # Failed children still exist on the LXD side.
+            self._children.extend(failures)
+            raise DeleteError(failures)
+
+    async def _load_child(self, url):
+        child = self._get_child(url)
+        await child.__aenter__()
+        return child
+
+    def _get_child(self, url):
+        return self._make_child(url, self._preloaded.pop(url, None))
+
+    def _listing_url(self):
+        if self.recursion:
+            return '%s?recursion=%d' % (self.url, self.recursion)
+        return self.url
+
+    def _make_child(self, url, data):
+        child = self.child_class(self._client, url, data)
+        child.priority = self.priority
+        return child
+
+    def _split_child(self, child):
+        # Returns the url and the data of a listing item. LXD returns urls
+        # without data when recursion isn't supported or disabled.
+        if isinstance(child, str):
+            return (child, None)
+        return (self._child_url(child[self.child_key]), child)
 
     def _child_url(self, name):
         return '%s/%s' % (self.url, name)
@@ -2,6 +2,7 @@
 from abc import abstractmethod
 
 from .operation import Operation
+from .scheduler import NORMAL
 
 
 class EndPoint:
@@ -9,10 +10,14 @@ class EndPoint:
 
     Members:
         url (str): The url of the endpoint, relative to base_url.
+        priority (int): Priority class of the requests sent by this endpoint,
+                        see aiolxd.core.scheduler. Can be overridden on an
+                        instance, i.e to serve a user request first.
 
     """
 
     url = None
+    priority = NORMAL
 
     def __init__(self, client, url=None):
         """Initialize this endpoint.
@@ -51,12 +56,20 @@ class EndPoint:
         Generally used at the end of a context manager.
         """
 
-    async def _query(self, method, data=None):
+    async def _query(self, method, data=None, headers=None):
         """Query the LXD api using this end point url.
 
         Args:
             method (str): HTTP method to use.
             data (Object): Data as a python object to send with the request.
+            headers (dict): Additional HTTP headers to send.
 
         """
-        return await Operation(self._client, method, self.url, data)
+        return await Operation(
+            self._client,
+            method,
+            self.url,
+            data,
+            headers,
+            self.priority
+        )
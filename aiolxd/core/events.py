@@ -0,0 +1,378 @@
+"""LXD event stream (/1.0/events) helpers."""
+from asyncio import CancelledError
+from asyncio import Condition
+from asyncio import Event
+from asyncio import ensure_future
+from asyncio import get_event_loop
+from asyncio import sleep
+from collections import OrderedDict
+from collections import deque
+
+from aiohttp import ClientError
+from aiohttp import WSMsgType
+
+# Subscriber queue overflow policies.
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+
+class EventSubscription:
+    """Asynchronous iterator on events received by an EventStream.
+
+    Events are the decoded LXD event dicts, with at least 'type', 'timestamp'
+    and 'metadata' keys. Received events are buffered in a queue of at most
+    queue_size events. When this queue is full, the policy decides what
+    happens :
+        DROP_OLDEST : The oldest queued event is discarded.
+        DROP_NEWEST : The received event is discarded.
+        BLOCK : The stream waits for this subscriber to consume events,
+                delaying every other subscriber of the stream.
+
+    Subscriptions should be closed when not used anymore, either explicitly or
+    by using them as an async context manager :
+        async with client.events(types=['lifecycle']) as events:
+            async for event in events:
+                ...
+
+    Members:
+        dropped (int): Number of events discarded because the queue was full.
+
+    """
+
+    def __init__(self, stream, types, queue_size, policy):
+        """Initialize this subscription.
+
+        Args:
+            stream (EventStream): The stream this subscription reads.
+            types (list): Event types to receive, None for all of them.
+            queue_size (int): Maximum number of queued events.
+            policy (str): Queue overflow policy.
+
+        """
+        assert policy in [DROP_OLDEST, DROP_NEWEST, BLOCK]
+        self._stream = stream
+        self._types = set(types) if types is not None else None
+        self._queue_size = queue_size
+        self._policy = policy
+        self._events = deque()
+        self._condition = Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def accepts(self, event):
+        """Return True if this subscription wants to receive event."""
+        return self._types is None or event.get('type') in self._types
+
+    async def push(self, event):
+        """Queue an event, applying the overflow policy if needed."""
+        async with self._condition:
+            if len(self._events) >= self._queue_size:
+                if self._policy == DROP_NEWEST:
+                    self.dropped = self.dropped + 1
+                    return
+
+                if self._policy == DROP_OLDEST:
+                    self._events.popleft()
+                    self.dropped = self.dropped + 1
+                else:
+                    await self._condition.wait_for(self._has_room)
+                    if self._closed:
+                        return
+
+            self._events.append(event)
+            self._condition.notify_all()
+
+    async def close(self):
+        """Stop receiving events, and end the iteration."""
+        if self._closed:
+            return
+
+        self._closed = True
+        await self._stream.unsubscribe(self)
+        async with self._condition:
+            self._condition.notify_all()
+
+    def __aiter__(self):
+        """Return this subscription, as an asynchronous iterator."""
+        return self
+
+    async def __anext__(self):
+        """Return the next event, waiting for it if needed."""
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._events or self._closed
+            )
+            if self._closed:
+                raise StopAsyncIteration()
+
+            event = self._events.popleft()
+            self._condition.notify_all()
+            return event
+
+    async def __aenter__(self):
+        """Enter a context, returning this subscription."""
+        return self
+
+    async def __aexit__(self, exception_type, exception, traceback):
+        """Exit a context, closing this subscription."""
+        await self.close()
+        return False
+
+    def _has_room(self):
+        return self._closed or len(self._events) < self._queue_size
+
+
+class EventStream:
+    """A single /1.0/events websocket shared between subscribers.
+
+    The websocket is opened when the first subscriber registers, and closed
+    when the last one leaves. If the connection is lost, the stream reconnects
+    automatically, right away if the lost connection delivered events, else
+    waiting between attempts from reconnect_delay up to max_reconnect_delay
+    seconds. Events emitted while disconnected are lost.
+
+    Members:
+        reconnect_delay (float): Initial delay between connection attempts.
+        max_reconnect_delay (float): Maximum delay between connection attempts.
+
+    """
+
+    reconnect_delay = 0.5
+    max_reconnect_delay = 30.0
+
+    def __init__(self, client, types=None):
+        """Initialize this stream.
+
+        Args:
+            client (aiolxd.Client): The LXD client.
+            types (list): Event types to request from LXD, None for all.
+
+        """
+        self._client = client
+        self._url = '/1.0/events'
+        if types is not None:
+            self._url = '%s?type=%s' % (self._url, ','.join(types))
+        self._subscribers = []
+        self._disconnect_callbacks = []
+        self._task = None
+        self._connected = Event()
+        self._attempted = Event()
+
+    @property
+    def connected(self):
+        """Return True if the websocket is currently connected."""
+        return self._connected.is_set()
+
+    async def wait_attempt(self):
+        """Wait until the stream tried to connect at least once."""
+        await self._attempted.wait()
+
+    def on_disconnect(self, callback):
+        """Register a function called each time the websocket is lost."""
+        self._disconnect_callbacks.append(callback)
+
+    def subscribe(self, types=None, queue_size=1024, policy=DROP_OLDEST):
+        """Register a new subscriber to this stream.
+
+        Args:
+            types (list): Event types to receive, None for all of them.
+            queue_size (int): Maximum number of events queued for this
+                              subscriber.
+            policy (str): What to do when the queue is full, one of
+                          DROP_OLDEST, DROP_NEWEST or BLOCK.
+
+        """
+        subscription = EventSubscription(self, types, queue_size, policy)
+        self._subscribers.append(subscription)
+        if self._task is None:
+            self._task = ensure_future(self._run())
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        """Remove a subscriber, closing the websocket if it was the last."""
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+        if not self._subscribers:
+            await self._disconnect()
+
+    async def close(self):
+        """Close the websocket, ending iteration on every subscription."""
+        for subscription in list(self._subscribers):
+            await subscription.close()
+        await self._disconnect()
+
+    async def _disconnect(self):
+        task = self._task
+        self._task = None
+        if task is None:
+            return
+
+        task.cancel()
+        try:
+            await task
+        except CancelledError:
+            pass
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                socket = await self._client.ws_connect(self._url)
+            except (ClientError, OSError):
+                self._attempted.set()
+                await sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            self._connected.set()
+            self._attempted.set()
+            received = False
+            try:
+                received = await self._read(socket)
+            except ClientError:
+                pass
+            finally:
+                self._connected.clear()
+                for callback in self._disconnect_callbacks:
+                    callback()
+                await socket.close()
+
+            # Reconnect right away after a working connection was lost, but
+            # back off if LXD keeps closing the websocket straight away.
+            if received:
+                delay = self.reconnect_delay
+            else:
+                await sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _read(self, socket):
+        received = False
+        async for message in socket:
+            if message.type not in [WSMsgType.TEXT, WSMsgType.BINARY]:
+                continue
+
+            received = True
+            event = self._client.codec.loads(message.data)
+            for subscriber in list(self._subscribers):
+                if subscriber.accepts(event):
+                    await subscriber.push(event)
+
+        return received
+
+
+class OperationWaiter:
+    """Wait for LXD operations using a single operation events websocket.
+
+    Instead of holding one /1.0/operations/{id}/wait request per pending
+    operation, every operation of a client is resolved from the same
+    /1.0/events?type=operation websocket. The waiter must be ready before the
+    operation is submitted, so its completion event can't be missed.
+
+    Members:
+        history_size (int): Number of finished operations remembered, so that
+                            an operation finishing before wait is called is
+                            still resolved.
+
+    """
+
+    history_size = 1024
+
+    def __init__(self, client):
+        """Initialize this waiter.
+
+        Args:
+            client (aiolxd.Client): The LXD client.
+
+        """
+        self._stream = EventStream(client, types=['operation'])
+        self._stream.on_disconnect(self._on_disconnect)
+        self._subscription = None
+        self._task = None
+        self._waiters = {}
+        self._finished = OrderedDict()
+        # Incremented each time the websocket is lost.
+        self._connection = 0
+
+    async def ready(self):
+        """Get the waiter ready to resolve an operation that will be submitted.
+
+        The first call opens the events websocket. Every call waits for the
+        first connection attempt, so operations submitted concurrently with
+        the first one are waited through the websocket too. Returns a token to
+        give to wait, or None if the websocket is not connected, in which case
+        the /wait endpoint should be used instead.
+        """
+        if self._subscription is None:
+            self._subscription = self._stream.subscribe(
+                types=['operation'],
+                policy=BLOCK
+            )
+            self._task = ensure_future(self._dispatch())
+
+        await self._stream.wait_attempt()
+
+        if not self._stream.connected:
+            return None
+
+        return self._connection
+
+    async def wait(self, operation_id, token):
+        """Wait for an operation to finish, and return it.
+
+        Args:
+            operation_id (str): Id of the operation to wait for.
+            token (int): Token returned by ready before submitting the
+                         operation.
+
+        Returns None if the events websocket was lost since the operation was
+        submitted, as its completion event may have been missed.
+
+        """
+        if operation_id in self._finished:
+            return self._finished.pop(operation_id)
+
+        if token != self._connection:
+            return None
+
+        waiter = get_event_loop().create_future()
+        self._waiters[operation_id] = waiter
+        try:
+            return await waiter
+        finally:
+            self._waiters.pop(operation_id, None)
+
+    async def close(self):
+        """Close the events websocket."""
+        if self._subscription is None:
+            return
+
+        await self._subscription.close()
+        await self._task
+        self._subscription = None
+        self._task = None
+        self._on_disconnect()
+
+    async def _dispatch(self):
+        async for event in self._subscription:
+            operation = event['metadata']
+            # Status codes from 200 are final : success, failure or cancelled.
+            if operation.get('status_code', 0) < 200:
+                continue
+
+            operation_id = operation['id']
+            waiter = self._waiters.get(operation_id)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(operation)
+                continue
+
+            self._finished[operation_id] = operation
+            while len(self._finished) > self.history_size:
+                self._finished.popitem(last=False)
+
+    def _on_disconnect(self):
+        self._connection = self._connection + 1
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_result(None)
@@ -0,0 +1,48 @@
+"""aiolxd exceptions."""
+
+
+class DeleteError(Exception):
+    """Raised when some children of a collection couldn't be deleted.
+
+    Members:
+        failures (dict): Exception raised for each child url that couldn't be
+                         deleted.
+
+    """
+
+    def __init__(self, failures):
+        """Initialize this error.
+
+        Args:
+            failures (dict): Exception raised by url of failed children.
+
+        """
+        super().__init__(
+            'Failed to delete %s' % ', '.join(sorted(failures))
+        )
+        self.failures = failures
+
+
+class OperationError(Exception):
+    """Raised when a LXD background operation ended with a failure.
+
+    Members:
+        operation (dict): The final operation metadata, with the status_code
+                          and the err message returned by LXD.
+
+    """
+
+    def __init__(self, operation):
+        """Initialize this error.
+
+        Args:
+            operation (dict): The final operation metadata.
+
+        """
+        super().__init__(
+            'Operation failed with status %s : %s' % (
+                operation.get('status_code'),
+                operation.get('err', '')
+            )
+        )
+        self.operation = operation
@@ -0,0 +1,116 @@
+"""Incremental extraction of JSON array items from a streamed body."""
+from re import compile as re_compile
+
+# Bytes changing the parser state. Everything else is skipped by the regex
+# engine instead of being looked at one byte at a time in Python.
+_TOKENS = re_compile(rb'[\[\]{}",:\\]')
+
+
+class JsonArrayParser:
+    """Extract the items of an array stored under a key of a JSON object.
+
+    Data is fed chunk by chunk, and the raw bytes of each item of the array
+    are returned as soon as they were fully received, i.e for LXD responses :
+
+    parser = JsonArrayParser('metadata')
+    async for chunk in client.download('/1.0/containers?recursion=2'):
+        for item in parser.feed(chunk):
+            child = codec.loads(item)
+
+    Only the item being received is kept in memory, whatever the array size.
+    The body is expected to be valid JSON : the parser only tracks nesting and
+    strings, and doesn't validate anything.
+    """
+
+    def __init__(self, key):
+        """Initialize the parser.
+
+        Args:
+            key (str): Key of the top-level object holding the array.
+
+        """
+        self._key = key.encode('utf-8')
+        self._buffer = bytearray()
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._last_string = None
+        self._expect_array = False
+        self._in_array = False
+        self._item_start = 0
+
+    def feed(self, data):
+        """Parse a chunk of the body, returning the completed array items."""
+        self._buffer.extend(data)
+        items = []
+        buffer = self._buffer
+        while True:
+            match = _TOKENS.search(buffer, self._position)
+            if match is None:
+                break
+
+            token = match.group()
+            self._position = match.end()
+            if self._in_string:
+                self._on_string_token(token, match)
+            else:
+                self._on_token(token, match, items)
+
+        self._trim()
+        return items
+
+    def _on_string_token(self, token, match):
+        if token == b'\\':
+            # Skip the escaped character, even if it's a quote.
+            self._position = match.end() + 1
+        elif token == b'"':
+            self._in_string = False
+            if self._depth == 1:
+                start = self._string_start + 1
+                self._last_string = bytes(self._buffer[start:match.start()])
+
+    def _on_token(self, token, match, items):
+        if token == b'"':
+            self._in_string = True
+            self._string_start = match.start()
+        elif token in b'[{':
+            self._depth = self._depth + 1
+            if token == b'[' and self._expect_array and self._depth == 2:
+                self._in_array = True
+                self._item_start = match.end()
+            self._expect_array = False
+        elif token in b']}':
+            if self._in_array and self._depth == 2:
+                self._add_item(match, items)
+                self._in_array = False
+            self._depth = self._depth - 1
+        elif token == b',':
+            self._expect_array = False
+            if self._in_array and self._depth == 2:
+                self._add_item(match, items)
+                self._item_start = match.end()
+        elif token == b':' and self._depth == 1:
+            self._expect_array = self._last_string == self._key
+
+    def _add_item(self, match, items):
+        item = bytes(self._buffer[self._item_start:match.start()]).strip()
+        if item:
+            items.append(item)
+
+    def _trim(self):
+        """Drop parsed data that won't be needed anymore."""
+        # The position can be past the end of the buffer, after an escape.
+        keep = min(self._position, len(self._buffer))
+        if self._in_array:
+            keep = min(keep, self._item_start)
+        if self._in_string and self._depth == 1:
+            keep = min(keep, self._string_start)
+
+        if not keep:
+            return
+
+        del self._buffer[:keep]
+        self._position = self._position - keep
+        self._item_start = self._item_start - keep
+        self._string_start = self._string_start - keep
@@ -0,0 +1,207 @@
+"""Adaptive client-side concurrency limiter."""
+from asyncio import TimeoutError  # pylint: disable=redefined-builtin
+from contextlib import asynccontextmanager
+from time import monotonic
+
+from aiohttp import ClientConnectionError
+from aiohttp import ClientResponseError
+
+from .scheduler import NORMAL
+from .scheduler import SlotQueue
+from .utils import is_long_poll
+
+
+class AimdLimit:
+    """Concurrency budget controlled by AIMD.
+
+    The limit follows additive increase, multiplicative decrease, like TCP
+    congestion control. Each request completed within latency_target without
+    error raises the limit by increase / limit, so the limit grows by about
+    increase each time a full window of requests succeeds. A slow or failed
+    request (5xx status, timeout or connection error) multiplies the limit by
+    backoff, at most once per latency_target, so a burst of slow responses to
+    requests sent together only counts once.
+
+    Waiting requests are served by priority class, with the same aging as
+    aiolxd.core.scheduler.PriorityScheduler : a request of priority p waits
+    as if it arrived p * aging seconds later. When a scheduler is also used,
+    requests are mostly queued here, as the limit is usually lower than the
+    scheduler concurrency.
+
+    Members:
+        limit (float): Current number of requests allowed in flight.
+        in_flight (int): Number of requests currently in flight.
+        decreases (int): Number of times the limit was decreased.
+
+    """
+
+    def __init__(self, initial=16, min_limit=1, max_limit=256,
+                 latency_target=0.5, backoff=0.5, increase=1.0, aging=1.0):
+        """Initialize the budget.
+
+        Args:
+            initial (int): Initial limit.
+            min_limit (int): The limit never goes below this value.
+            max_limit (int): The limit never goes above this value.
+            latency_target (float): Latency in seconds above which a request
+                                    is considered slow.
+            backoff (float): Factor applied to the limit on slow or failed
+                             requests.
+            increase (float): Increase of the limit per window of successful
+                              requests.
+            aging (float): Delay in seconds a waiting request gets per
+                           priority level.
+
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.increase = increase
+        self.aging = aging
+        self.decreases = 0
+        self._last_decrease = None
+        self._queue = SlotQueue()
+
+    @property
+    def in_flight(self):
+        """Return the number of requests in flight."""
+        return self._queue.in_flight
+
+    @property
+    def waiting(self):
+        """Return the number of requests waiting for a slot."""
+        return len(self._queue)
+
+    async def acquire(self, priority=NORMAL):
+        """Wait until a request of the given priority can be sent."""
+        deadline = monotonic() + priority * self.aging
+        await self._queue.acquire(deadline, int(self.limit))
+
+    def release(self, latency=None, failed=False):
+        """Release a slot, adjusting the limit.
+
+        Args:
+            latency (float): Request latency in seconds, None to release
+                             without adjusting the limit, for example when
+                             the request was cancelled.
+            failed (bool): True if the request failed because of the daemon.
+
+        """
+        if failed or (latency is not None and latency > self.latency_target):
+            self._decrease()
+        elif latency is not None:
+            self.limit = min(
+                float(self.max_limit),
+                self.limit + self.increase / self.limit
+            )
+        self._queue.release(int(self.limit))
+
+    def _decrease(self):
+        now = monotonic()
+        last = self._last_decrease
+        if last is not None and now - last < self.latency_target:
+            return
+
+        self._last_decrease = now
+        self.decreases = self.decreases + 1
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+
+
+class AdaptiveLimiter:
+    """Limit the number of requests in flight to the LXD daemon.
+
+    When too many requests are sent at once, the daemon database becomes the
+    bottleneck and latencies explode. The limiter adjusts the number of
+    requests in flight with an AIMD controller (see AimdLimit), with separate
+    budgets for reads (GET, HEAD) and for mutating requests, which are much
+    more expensive for the daemon :
+
+    async with Client(url, limiter=AdaptiveLimiter()) as client:
+        ...
+
+    Operation waits (/1.0/operations/{id}/wait) and the events websocket are
+    long polls : they are never limited, and don't affect the limits.
+
+    Members:
+        read (AimdLimit): Budget of GET and HEAD requests.
+        write (AimdLimit): Budget of other requests.
+
+    """
+
+    def __init__(self, read=None, write=None):
+        """Initialize the limiter.
+
+        Args:
+            read (AimdLimit): Budget of reads, None for the default one.
+            write (AimdLimit): Budget of writes, None for the default one.
+
+        """
+        self.read = read if read is not None else AimdLimit(initial=32)
+        self.write = write if write is not None else AimdLimit(initial=8)
+
+    def budget(self, method, url):
+        """Return the budget of a request, or None if it's not limited."""
+        if is_long_poll(url):
+            return None
+
+        if method in ('get', 'head'):
+            return self.read
+        return self.write
+
+    @asynccontextmanager
+    async def slot(self, method, url, priority=NORMAL):
+        """Wait until a request can be sent, and record its outcome.
+
+        Used as an async context manager around the request :
+
+        async with limiter.slot('get', url):
+            response = await session.get(url)
+
+        """
+        budget = self.budget(method, url)
+        if budget is None:
+            yield
+            return
+
+        await budget.acquire(priority)
+        start = monotonic()
+        latency = None
+        failed = False
+        try:
+            yield
+            latency = monotonic() - start
+        except ClientResponseError as error:
+            latency = monotonic() - start
+            failed = error.status >= 500
+            raise
+        except (ClientConnectionError, TimeoutError):
+            latency = monotonic() - start
+            failed = True
+            raise
+        finally:
+            budget.release(latency, failed)
+
+    def prometheus(self, prefix='aiolxd'):
+        """Return the limiter state in Prometheus text format."""
+        lines = []
+        for (name, attribute, description) in [
+                ('limit', 'limit', 'Current AIMD concurrency limit.'),
+                ('in_flight', 'in_flight', 'Requests in flight.'),
+                ('waiting', 'waiting', 'Requests waiting for a slot.'),
+                ('limit_decreases_total', 'decreases',
+                 'Number of limit decreases.'),
+        ]:
+            metric = '%s_limiter_%s' % (prefix, name)
+            metric_type = 'counter' if name.endswith('_total') else 'gauge'
+            lines.append('# HELP %s %s' % (metric, description))
+            lines.append('# TYPE %s %s' % (metric, metric_type))
+            for (budget_name, budget) in [('read', self.read),
+                                          ('write', self.write)]:
+                lines.append('%s{budget="%s"} %s' % (
+                    metric,
+                    budget_name,
+                    getattr(budget, attribute)
+                ))
+        return '\n'.join(lines) + '\n'
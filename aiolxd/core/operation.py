@@ -1,18 +1,35 @@
 """Operation helpers."""
+from asyncio import FIRST_COMPLETED
 from asyncio import Task
+from asyncio import ensure_future
 from asyncio import wait
+from contextlib import nullcontext
 
 from aiohttp import WSMsgType
 
+from .scheduler import NORMAL
+from .streams import DEFAULT_FLUSH_INTERVAL
+from .streams import DEFAULT_FRAME_SIZE
+from .streams import WebsocketWriter
+from .tracing import OPERATION_SUBMIT
+from .tracing import OPERATION_WAIT
+from .tracing import OPERATION_WEBSOCKET
+
 
 class Operation:
     """A LXD operation, either background or synchronous.
 
     Allows to await the same way synchronous & asynchronous operations, and
     handle websockets for operation creating some.
+
+    Members:
+        response (aiolxd.core.client.ApiResponse): Response to the request
+            submitting this operation, once it was awaited.
+
     """
 
-    def __init__(self, client, method, url, data):
+    def __init__(self, client, method, url, data, headers=None,
+                 priority=NORMAL):
         """Initialize this operation.
 
         Args:
@@ -20,13 +37,19 @@ class Operation:
             method (str) : HTTP method (get, post, put, patch).
             url (str) : The endpoint of this operation.
             data (dict) : Parameters to send to this command.
+            headers (dict) : Additional HTTP headers to send.
+            priority (int) : Priority class of the request, see
+                             aiolxd.core.scheduler.
 
         """
         self._client = client
         self._method = method
         self._url = url
         self._data = data
+        self._headers = headers
+        self._priority = priority
         self._id = None
+        self.response = None
 
     def __await__(self):
         """Await until this operation is terminated.
@@ -53,6 +76,9 @@ class Operation:
             if handler is None:
                 return
 
+            # aiohttp always decodes text frames, their raw bytes aren't
+            # available. LXD sends exec output as binary frames, so this copy
+            # only happens for text frames sent by other servers.
             data = message.data.encode('utf-8')
             await handler(data)
 
@@ -61,24 +87,55 @@ class Operation:
             WSMsgType.TEXT: _on_text
         }
 
-        while True:
-            message = await socket.receive()
-            message_type = message.type
-            if message_type in handlers:
-                message_handler = handlers[message_type]
-                await message_handler(message)
-            elif message_type in [WSMsgType.CLOSE, WSMsgType.CLOSED]:
-                break
+        try:
+            while True:
+                message = await socket.receive()
+                message_type = message.type
+                if message_type in handlers:
+                    message_handler = handlers[message_type]
+                    await message_handler(message)
+                elif message_type in [WSMsgType.CLOSE, WSMsgType.CLOSED]:
+                    break
+        finally:
+            # The job is cancelled if the operation is, i.e on a timeout.
+            await socket.close()
 
-    async def _write_websocket(self, secret, handler):
+    async def _write_websocket(self, secret, handler,
+                               frame_size=DEFAULT_FRAME_SIZE,
+                               flush_interval=DEFAULT_FLUSH_INTERVAL):
         socket = await self.__connect_websocket(secret)
 
         if handler is None:
             await socket.close()
             return
 
-        async for data in handler():
-            await socket.send_bytes(data)
+        # Data yielded by handler is coalesced in frames of frame_size bytes.
+        pump = None
+        writer = handler
+        if not isinstance(writer, WebsocketWriter):
+            writer = WebsocketWriter(
+                frame_size=frame_size,
+                flush_interval=flush_interval
+            )
+            pump = ensure_future(_pump(handler, writer))
+
+        sender = ensure_future(_send(socket, writer))
+        # LXD closes the websocket when the command exits, even if stdin is
+        # still open : sending stops then, and the writer is closed.
+        closed = ensure_future(socket.receive())
+        jobs = [it for it in [sender, closed, pump] if it is not None]
+        try:
+            await wait([sender, closed], return_when=FIRST_COMPLETED)
+            if sender.done():
+                sender.result()
+                if pump is not None:
+                    await pump
+        finally:
+            for job in jobs:
+                job.cancel()
+            await wait(jobs)
+            # Closing stdin signals EOF to the remote process.
+            await socket.close()
 
     async def _control_websocket(self, secret):
         socket = await self.__connect_websocket(secret)
@@ -86,26 +143,100 @@ class Operation:
         await socket.close()
 
     async def __process(self):
-        result = await self._client.query(
-            self._method,
-            self._url,
-            self._data
-        )
+        waiter = self._client.operation_waiter
+        token = None
+        # Read requests never create background operations.
+        if waiter is not None and self._method != 'get':
+            token = await waiter.ready()
+
+        with self._span(OPERATION_SUBMIT):
+            self.response = await self._client.request(
+                self._method,
+                self._url,
+                self._data,
+                self._headers,
+                self._priority
+            )
+        result = self.response.data
+        # No body, for example on a 304 Not Modified.
+        if result is None:
+            return None
+
         if result['type'] == 'sync':
             return result['metadata']
 
         if result['type'] == 'async':
             metadata = result['metadata']
             jobs = self._get_jobs(metadata)
+            if self._client.tracer is not None:
+                jobs = [self._trace_job(it) for it in jobs]
             tasks = [Task(it) for it in jobs]
 
             self._id = metadata['id']
-            wait_url = '/1.0/operations/{id}/wait'.format(id=self._id)
-            result = await self._client.query('get', wait_url)
-            await wait(tasks)
+            try:
+                with self._span(OPERATION_WAIT):
+                    operation = None
+                    if token is not None:
+                        operation = await waiter.wait(self._id, token)
+
+                    if operation is None:
+                        operation = await self.__wait()
+
+                if tasks:
+                    await wait(tasks)
+            finally:
+                # Websocket jobs are closed if the operation is cancelled,
+                # i.e on a timeout, instead of running in the background.
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    await wait(tasks)
+
+            # Responses cached while the operation was running may be stale.
+            self._client.invalidate(self._url)
+            return operation
 
         return result['metadata']
 
+    def _span(self, name):
+        tracer = self._client.tracer
+        if tracer is None:
+            return nullcontext()
+        return tracer.span(name, self._url, method=self._method)
+
+    async def _trace_job(self, job):
+        with self._span(OPERATION_WEBSOCKET):
+            return await job
+
+    async def __wait(self):
+        wait_url = '/1.0/operations/{id}/wait'.format(id=self._id)
+        result = await self._client.query(
+            'get',
+            wait_url,
+            priority=self._priority
+        )
+        return result['metadata']
+
     async def __connect_websocket(self, secret):
         assert self._id is not None
         return await self._client.connect_websocket(self._id, secret)
+
+
+async def _send(socket, writer):
+    frames = writer.chunks()
+    try:
+        async for frame in frames:
+            await socket.send_bytes(frame)
+    finally:
+        await frames.aclose()
+
+
+async def _pump(source, writer):
+    try:
+        async for data in source():
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            writer.write(data)
+            await writer.wait_writable()
+    finally:
+        writer.close()
@@ -0,0 +1,112 @@
+"""Connection pool metrics."""
+from time import perf_counter
+
+from aiohttp import TraceConfig
+
+
+class PoolStats:
+    """Live metrics of a client connection pool.
+
+    in_use, idle and waiters are read from the connector when accessed. The
+    acquire latency is the time between the start of a request and the moment
+    it got a connection, either reused from the pool, or newly created after
+    waiting for a free slot if the pool was full.
+
+    Members:
+        created (int): Number of connections created.
+        reused (int): Number of requests that reused an idle connection.
+        queued (int): Number of requests that waited for a free slot.
+        acquire_time (float): Total acquire latency, in seconds.
+        max_acquire_time (float): Longest acquire latency, in seconds.
+
+    """
+
+    def __init__(self, connector):
+        """Initialize the metrics.
+
+        Args:
+            connector (aiohttp.BaseConnector): The client connector.
+
+        """
+        self._connector = connector
+        self.created = 0
+        self.reused = 0
+        self.queued = 0
+        self.acquire_time = 0.0
+        self.max_acquire_time = 0.0
+
+    @property
+    def limit(self):
+        """Return the maximum number of connections, 0 for no limit."""
+        return self._connector.limit
+
+    @property
+    def limit_per_host(self):
+        """Return the maximum number of connections per host, 0 for none."""
+        return self._connector.limit_per_host
+
+    @property
+    def in_use(self):
+        """Return the number of connections currently used by requests."""
+        # pylint: disable=protected-access
+        return len(getattr(self._connector, '_acquired', ()))
+
+    @property
+    def idle(self):
+        """Return the number of idle connections kept alive in the pool."""
+        # pylint: disable=protected-access
+        connections = getattr(self._connector, '_conns', {})
+        return sum(len(it) for it in connections.values())
+
+    @property
+    def waiters(self):
+        """Return the number of requests waiting for a free connection."""
+        # pylint: disable=protected-access
+        waiters = getattr(self._connector, '_waiters', {})
+        return sum(len(it) for it in waiters.values())
+
+    @property
+    def acquired(self):
+        """Return the number of connections acquired by requests."""
+        return self.created + self.reused
+
+    @property
+    def mean_acquire_time(self):
+        """Return the mean acquire latency, in seconds."""
+        if not self.acquired:
+            return 0.0
+        return self.acquire_time / self.acquired
+
+    def trace_config(self):
+        """Return an aiohttp TraceConfig measuring the acquire latency."""
+        config = TraceConfig()
+
+        async def _on_request_start(_, context, __):
+            context.acquire_start = perf_counter()
+
+        async def _on_queued(_, __, ___):
+            self.queued = self.queued + 1
+
+        async def _on_created(_, context, __):
+            self.created = self.created + 1
+            self._add_acquire(context)
+
+        async def _on_reused(_, context, __):
+            self.reused = self.reused + 1
+            self._add_acquire(context)
+
+        config.on_request_start.append(_on_request_start)
+        config.on_connection_queued_start.append(_on_queued)
+        config.on_connection_create_end.append(_on_created)
+        config.on_connection_reuseconn.append(_on_reused)
+        return config
+
+    def _add_acquire(self, context):
+        start = getattr(context, 'acquire_start', None)
+        if start is None:
+            return
+
+        duration = perf_counter() - start
+        context.acquire_start = None
+        self.acquire_time = self.acquire_time + duration
+        self.max_acquire_time = max(self.max_acquire_time, duration)
@@ -0,0 +1,137 @@
+"""Retries of idempotent requests on transient failures."""
+from asyncio import TimeoutError  # pylint: disable=redefined-builtin
+from collections import Counter
+from random import uniform
+
+from aiohttp import ClientConnectionError
+from aiohttp import ClientResponseError
+
+# Methods that can be sent again without side effects. Operation waits are
+# GET requests, so they are retried too.
+_RETRIED_METHODS = ('get', 'head')
+
+
+class RetryPolicy:
+    """Retry idempotent requests failing because of a transient error.
+
+    GET and HEAD requests, including operation waits, are sent again when the
+    connection fails, times out, or when LXD answers with one of
+    retry_statuses. The delay before each retry is drawn at random between 0
+    and base_delay, doubled at each retry and capped to max_delay (exponential
+    backoff with full jitter), so clients failing together don't retry
+    together.
+
+    To avoid retry storms when the daemon is really down, retries are limited
+    by a budget : it holds at most budget retries, and each request sent adds
+    budget_ratio to it. In the long run, at most budget_ratio retries are done
+    per request.
+
+    Members:
+        retries (int): Number of retries done.
+        gave_up (int): Number of requests that failed after all attempts.
+        budget_exhausted (int): Number of retries denied by the budget.
+        reasons (Counter): Number of retries by error, i.e 503 or
+                           ServerDisconnectedError.
+
+    """
+
+    def __init__(self, attempts=3, base_delay=0.1, max_delay=5.0,
+                 retry_statuses=(429, 502, 503, 504), budget=10,
+                 budget_ratio=0.1):
+        """Initialize the policy.
+
+        Args:
+            attempts (int): Maximum number of times a request is sent.
+            base_delay (float): Maximum delay in seconds before the first
+                                retry, doubled at each retry.
+            max_delay (float): Maximum delay in seconds before a retry.
+            retry_statuses (tuple): HTTP statuses triggering a retry.
+            budget (int): Maximum number of retries available at once.
+            budget_ratio (float): Retries added to the budget per request.
+
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.retries = 0
+        self.gave_up = 0
+        self.budget_exhausted = 0
+        self.reasons = Counter()
+        self._balance = float(budget)
+
+    @staticmethod
+    def applies(method):
+        """Return True if requests of method can be retried."""
+        return method in _RETRIED_METHODS
+
+    def on_request(self):
+        """Refill the budget when a request is sent for the first time."""
+        self._balance = min(
+            float(self.budget),
+            self._balance + self.budget_ratio
+        )
+
+    def get_delay(self, attempt, error):
+        """Return the delay before retrying after error, None to give up.
+
+        Args:
+            attempt (int): Number of times the request was already sent.
+            error (Exception): The error raised by the last attempt.
+
+        """
+        reason = self._get_reason(error)
+        if reason is None:
+            return None
+
+        if attempt >= self.attempts:
+            self.gave_up = self.gave_up + 1
+            return None
+
+        if self._balance < 1:
+            self.budget_exhausted = self.budget_exhausted + 1
+            return None
+
+        self._balance = self._balance - 1
+        self.retries = self.retries + 1
+        self.reasons[reason] += 1
+        return uniform(
+            0,
+            min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def prometheus(self, prefix='aiolxd'):
+        """Return the retry metrics in Prometheus text format."""
+        lines = []
+        name = '%s_retries_total' % prefix
+        lines.append('# HELP %s Retried requests, by error.' % name)
+        lines.append('# TYPE %s counter' % name)
+        for (reason, count) in sorted(self.reasons.items()):
+            lines.append('%s{reason="%s"} %d' % (name, reason, count))
+
+        for (suffix, value, description) in [
+                ('retries_gave_up_total', self.gave_up,
+                 'Requests failed after all attempts.'),
+                ('retries_budget_exhausted_total', self.budget_exhausted,
+                 'Retries denied by the retry budget.'),
+        ]:
+            name = '%s_%s' % (prefix, suffix)
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s counter' % name)
+            lines.append('%s %d' % (name, value))
+
+        return '\n'.join(lines) + '\n'
+
+    def _get_reason(self, error):
+        """Return the retry reason of an error, None if it's not transient."""
+        if isinstance(error, ClientResponseError):
+            if error.status in self.retry_statuses:
+                return str(error.status)
+            return None
+
+        if isinstance(error, (ClientConnectionError, TimeoutError)):
+            return type(error).__name__
+
+        return None
@@ -0,0 +1,145 @@
+"""Priority scheduling of LXD API requests."""
+from asyncio import get_event_loop
+from contextlib import asynccontextmanager
+from heapq import heapify
+from heapq import heappop
+from heapq import heappush
+from itertools import count
+from time import monotonic
+
+from .utils import is_long_poll
+
+# Priority classes, the lowest value being served first.
+INTERACTIVE = 0
+NORMAL = 1
+BULK = 2
+
+
+class PriorityScheduler:
+    """Serve pending requests by priority instead of in arrival order.
+
+    At most concurrency requests are sent at once. When all slots are taken,
+    waiting requests are queued, and the most urgent one is sent first when a
+    slot is freed, so interactive requests don't wait behind bulk jobs :
+
+    async with Client(url, scheduler=PriorityScheduler()) as client:
+        await client.query('get', url, priority=INTERACTIVE)
+
+    To protect low priority requests from starvation, priorities age : a
+    request of priority p is served as if it arrived p * aging seconds later.
+    A bulk request thus waits at most 2 * aging seconds more than an
+    interactive one queued after it.
+
+    Operation waits and the events stream are long polls, never queued.
+
+    Members:
+        concurrency (int): Maximum number of requests sent at once.
+        aging (float): Delay in seconds a request gets per priority level.
+        in_flight (int): Number of requests being sent.
+        served (dict): Number of requests sent by priority.
+
+    """
+
+    def __init__(self, concurrency=32, aging=1.0):
+        """Initialize the scheduler.
+
+        Args:
+            concurrency (int): Maximum number of requests sent at once.
+            aging (float): Delay in seconds a request gets per priority level.
+
+        """
+        self.concurrency = concurrency
+        self.aging = aging
+        self.served = {}
+        self._queue = SlotQueue()
+
+    @property
+    def in_flight(self):
+        """Return the number of requests being sent."""
+        return self._queue.in_flight
+
+    @property
+    def waiting(self):
+        """Return the number of queued requests."""
+        return len(self._queue)
+
+    @asynccontextmanager
+    async def slot(self, url, priority=NORMAL):
+        """Wait until a request of the given priority can be sent.
+
+        Used as an async context manager around the request.
+        """
+        if is_long_poll(url):
+            yield
+            return
+
+        deadline = monotonic() + priority * self.aging
+        await self._queue.acquire(deadline, self.concurrency)
+        self.served[priority] = self.served.get(priority, 0) + 1
+        try:
+            yield
+        finally:
+            self._queue.release(self.concurrency)
+
+
+class SlotQueue:
+    """Slots handed over to waiters by deadline, the earliest one first.
+
+    Used by PriorityScheduler and aiolxd.core.limiter.AimdLimit, which
+    compute deadlines from the request priority. The number of slots is
+    given on each call, as it can change over time.
+
+    Members:
+        in_flight (int): Number of slots taken.
+
+    """
+
+    def __init__(self):
+        """Initialize an empty queue."""
+        self.in_flight = 0
+        self._waiters = []
+        self._sequence = count()
+
+    def __len__(self):
+        """Return the number of waiters."""
+        return len(self._waiters)
+
+    async def acquire(self, deadline, limit):
+        """Wait until one of limit slots is free, and take it.
+
+        Args:
+            deadline (float): time.monotonic() value ordering waiters.
+            limit (int): Current number of slots.
+
+        """
+        if not self._waiters and self.in_flight < limit:
+            self.in_flight = self.in_flight + 1
+            return
+
+        waiter = get_event_loop().create_future()
+        entry = (deadline, next(self._sequence), waiter)
+        heappush(self._waiters, entry)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over right before cancellation.
+                self.release(limit)
+            elif entry in self._waiters:
+                # Dropped right away, so waiters aren't overcounted.
+                self._waiters.remove(entry)
+                heapify(self._waiters)
+            raise
+
+    def release(self, limit):
+        """Free a slot, handing it over to the next waiter if any."""
+        self.in_flight = self.in_flight - 1
+        self._wake_up(limit)
+
+    def _wake_up(self, limit):
+        while self._waiters and self.in_flight < limit:
+            (_, _, waiter) = heappop(self._waiters)
+            # Cancelled waiters not resumed yet are skipped.
+            if not waiter.done():
+                self.in_flight = self.in_flight + 1
+                waiter.set_result(None)
@@ -0,0 +1,327 @@
+"""Stream-like wrappers around operation websockets."""
+from asyncio import Event
+from asyncio import IncompleteReadError
+from asyncio import LimitOverrunError
+from asyncio import TimeoutError  # pylint: disable=redefined-builtin
+from asyncio import wait_for
+from collections import deque
+
+DEFAULT_LIMIT = 2 ** 16
+DEFAULT_FRAME_SIZE = 2 ** 16
+DEFAULT_FLUSH_INTERVAL = 0.005
+
+
+class WebsocketReader:
+    """Bounded buffer of data received from a websocket.
+
+    Provides the reading methods of asyncio.StreamReader. At most limit bytes
+    are buffered : when the buffer is full, feed waits for the consumer to read
+    some data, which in turn stops reading the websocket. A slow consumer
+    throttles the websocket instead of letting data pile up in memory.
+
+    It can also be iterated line by line with async for.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT):
+        """Initialize the reader.
+
+        Args:
+            limit (int): Size in bytes above which feed blocks.
+
+        """
+        self._limit = limit
+        self._buffer = bytearray()
+        self._eof = False
+        self._data_available = Event()
+        self._room_available = Event()
+        self._room_available.set()
+
+    async def feed(self, data):
+        """Add data to the buffer, waiting for room if it's full."""
+        while len(self._buffer) >= self._limit and not self._eof:
+            self._room_available.clear()
+            await self._room_available.wait()
+
+        self._buffer.extend(data)
+        self._data_available.set()
+
+    def feed_eof(self):
+        """Signal no more data will be received."""
+        self._eof = True
+        self._data_available.set()
+        self._room_available.set()
+
+    def at_eof(self):
+        """Return True if the buffer is empty and feed_eof was called."""
+        return self._eof and not self._buffer
+
+    async def read(self, n=-1):
+        """Read up to n bytes, or until EOF if n is negative."""
+        if n == 0:
+            return b''
+
+        if n > 0:
+            await self._wait_data()
+            return self._consume(n)
+
+        chunks = []
+        while True:
+            await self._wait_data()
+            if not self._buffer:
+                return b''.join(chunks)
+            chunks.append(self._consume(len(self._buffer)))
+
+    async def readexactly(self, n):
+        """Read exactly n bytes.
+
+        Raises:
+            IncompleteReadError: If EOF is reached before n bytes were read.
+
+        """
+        chunks = []
+        remaining = n
+        while remaining:
+            await self._wait_data()
+            if not self._buffer:
+                raise IncompleteReadError(b''.join(chunks), n)
+            chunk = self._consume(remaining)
+            chunks.append(chunk)
+            remaining = remaining - len(chunk)
+        return b''.join(chunks)
+
+    async def readuntil(self, separator=b'\n'):
+        """Read data until separator is found, separator included.
+
+        Raises:
+            IncompleteReadError: If EOF is reached before separator is found.
+            LimitOverrunError: If the buffer is full without separator.
+
+        """
+        start = 0
+        while True:
+            index = self._buffer.find(separator, start)
+            if index != -1:
+                return self._consume(index + len(separator))
+
+            if self._eof:
+                partial = self._consume(len(self._buffer))
+                raise IncompleteReadError(partial, None)
+
+            if len(self._buffer) >= self._limit:
+                raise LimitOverrunError(
+                    'Separator is not found, and chunk exceed the limit',
+                    len(self._buffer)
+                )
+
+            start = max(0, len(self._buffer) - len(separator) + 1)
+            self._data_available.clear()
+            await self._data_available.wait()
+
+    async def readline(self):
+        """Read a line, or the remaining data if EOF is reached before."""
+        try:
+            return await self.readuntil(b'\n')
+        except IncompleteReadError as error:
+            return error.partial
+
+    def __aiter__(self):
+        """Iterate on lines."""
+        return self
+
+    async def __anext__(self):
+        """Return the next line."""
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration()
+        return line
+
+    async def _wait_data(self):
+        while not self._buffer and not self._eof:
+            self._data_available.clear()
+            await self._data_available.wait()
+
+    def _consume(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self._room_available.set()
+        return data
+
+
+class WebsocketWriter:
+    """Buffer of data to send to a websocket, coalescing small writes.
+
+    Provides the writing methods of asyncio.StreamWriter. Written data is
+    gathered in frames of frame_size bytes, so many small writes don't turn
+    into as many tiny websocket messages. A partial frame is sent at most
+    flush_interval seconds after its first byte was written, or right away
+    when drain is called.
+
+    Any bytes-like object can be written. Immutable bytes aren't copied until
+    they are sent, and chunks bigger than a frame are sent as memoryview
+    slices without being copied at all. Other bytes-like objects, like
+    bytearray, are copied when written, so they can be modified or reused
+    as soon as write returns.
+
+    drain waits until less than limit bytes are waiting to be sent. Closing
+    the writer closes the websocket once all buffered data was sent,
+    signaling EOF to the remote process. If the remote process closes the
+    websocket first, the writer is closed and pending data is dropped, like
+    with a pipe whose reader exited.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, frame_size=DEFAULT_FRAME_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """Initialize the writer.
+
+        Args:
+            limit (int): Buffered size in bytes above which drain waits.
+            frame_size (int): Maximum size of sent websocket messages.
+            flush_interval (float): Delay in seconds after which a partial
+                                    frame is sent.
+
+        """
+        self._limit = limit
+        self._frame_size = frame_size
+        self._flush_interval = flush_interval
+        self._chunks = deque()
+        self._size = 0
+        self._closing = False
+        self._flush_size = 0
+        self._data_available = Event()
+        self._room_available = Event()
+        self._room_available.set()
+        self._closed = Event()
+
+    def write(self, data):
+        """Queue data to be sent.
+
+        Data written after the websocket was closed is dropped.
+        """
+        if self._closed.is_set():
+            return
+
+        assert not self._closing, 'Writer is closed'
+        view = memoryview(data).cast('B')
+        if not view:
+            return
+
+        if not isinstance(view.obj, bytes):
+            copy = memoryview(bytes(view))
+            # Release the buffer now, so the caller can resize it.
+            view.release()
+            view = copy
+
+        # Wake up the sender to start the flush timer on the first pending
+        # data, or to send a full frame.
+        if not self._size or self._size + len(view) >= self._frame_size:
+            self._data_available.set()
+
+        self._chunks.append(view)
+        self._size = self._size + len(view)
+        if self._size > self._limit:
+            self._room_available.clear()
+
+    def writelines(self, data):
+        """Queue a list of data chunks to be sent."""
+        for chunk in data:
+            self.write(chunk)
+
+    @staticmethod
+    def can_write_eof():
+        """Return True, as closing the writer signals EOF."""
+        return True
+
+    def write_eof(self):
+        """Close the writer once buffered data is sent."""
+        self.close()
+
+    def close(self):
+        """Close the writer once buffered data is sent."""
+        self._closing = True
+        self._data_available.set()
+
+    def is_closing(self):
+        """Return True if the writer is closed or being closed."""
+        return self._closing
+
+    async def drain(self):
+        """Send buffered data, and wait until its size is under the limit."""
+        self._flush_size = self._size
+        self._data_available.set()
+        await self.wait_writable()
+
+    async def wait_writable(self):
+        """Wait until the buffered data size is under the limit.
+
+        Unlike drain, doesn't send a partial frame right away.
+        """
+        await self._room_available.wait()
+
+    async def wait_closed(self):
+        """Wait until the writer is closed and all data was sent."""
+        await self._closed.wait()
+
+    async def chunks(self):
+        """Yield frames of buffered data, until the writer is closed.
+
+        Used as the data source of the websocket.
+        """
+        try:
+            while True:
+                await self._wait_frame()
+                if not self._chunks:
+                    return
+
+                frame = self._get_frame()
+                yield frame
+                self._size = self._size - len(frame)
+                self._flush_size = max(0, self._flush_size - len(frame))
+                if self._size <= self._limit:
+                    self._room_available.set()
+        finally:
+            # Data can't be sent anymore once the websocket was closed.
+            self._chunks.clear()
+            self._size = 0
+            self._closing = True
+            self._room_available.set()
+            self._closed.set()
+
+    async def _wait_frame(self):
+        """Wait until a frame can be sent."""
+        while not self._frame_ready():
+            self._data_available.clear()
+            timeout = None
+            if self._chunks:
+                timeout = self._flush_interval
+
+            try:
+                await wait_for(self._data_available.wait(), timeout)
+            except TimeoutError:
+                return
+
+    def _frame_ready(self):
+        if self._closing or self._flush_size:
+            return True
+
+        return self._size >= self._frame_size
+
+    def _get_frame(self):
+        chunk = self._chunks[0]
+        # Big chunks are sliced without copy.
+        if len(chunk) >= self._frame_size:
+            frame = chunk[:self._frame_size]
+            self._pop(self._frame_size)
+            return frame
+
+        frame = bytearray()
+        while self._chunks and len(frame) < self._frame_size:
+            chunk = self._chunks[0]
+            size = min(len(chunk), self._frame_size - len(frame))
+            frame.extend(chunk[:size])
+            self._pop(size)
+        return frame
+
+    def _pop(self, size):
+        chunk = self._chunks.popleft()
+        if size < len(chunk):
+            self._chunks.appendleft(chunk[size:])
@@ -0,0 +1,277 @@
+"""Request and operation tracing, latency histograms and metrics export."""
+from bisect import bisect_left
+from collections import Counter
+from collections import defaultdict
+from time import perf_counter
+
+from aiohttp import TraceConfig
+
+# Latency histograms buckets upper bounds, in seconds.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0
+)
+
+# Span names.
+HTTP_REQUEST = 'http.request'
+OPERATION_SUBMIT = 'operation.submit'
+OPERATION_WAIT = 'operation.wait'
+OPERATION_WEBSOCKET = 'operation.websocket'
+
+
+class Histogram:
+    """Cumulative histogram of observed values.
+
+    Members:
+        buckets (tuple): Upper bounds of the buckets.
+        counts (list): Number of values in each bucket, the last one counting
+                       values above the last bound.
+        sum (float): Sum of observed values.
+        count (int): Number of observed values.
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize the histogram."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Add a value to the histogram."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum = self.sum + value
+        self.count = self.count + 1
+
+    def cumulative_counts(self):
+        """Yield (upper bound, count of values under it), ending with inf."""
+        total = 0
+        bounds = list(self.buckets) + [float('inf')]
+        for (bound, count) in zip(bounds, self.counts):
+            total = total + count
+            yield (bound, total)
+
+
+class Span:
+    """A timed step of a request or an operation.
+
+    Members:
+        name (str): Step name, i.e http.request or operation.wait.
+        endpoint (str): Endpoint template, with names replaced by {name}.
+        url (str): Url of the request or operation.
+        duration (float): Duration in seconds, once the span is finished.
+        attributes (dict): Additional data, like the HTTP method and status,
+                           or the number of bytes sent and received.
+
+    """
+
+    def __init__(self, tracer, name, url, attributes=None):
+        """Start the span."""
+        self.name = name
+        self.url = url
+        self.endpoint = get_endpoint(url)
+        self.attributes = attributes if attributes is not None else {}
+        self.duration = None
+        self._tracer = tracer
+        self._start = perf_counter()
+
+    def finish(self):
+        """Stop the span, and record it in the tracer, if not done yet."""
+        if self.duration is not None:
+            return
+
+        self.duration = perf_counter() - self._start
+        self._tracer.record(self)
+
+    def __enter__(self):
+        """Return this span."""
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        """Finish this span, flagging errors."""
+        if exception_type is not None:
+            self.attributes['error'] = exception_type.__name__
+        self.finish()
+        return False
+
+
+class Tracer:
+    """Record spans of LXD requests and operations, and aggregate metrics.
+
+    Pass a tracer to the client to enable tracing, i.e :
+
+    tracer = Tracer()
+    tracer.add_callback(lambda span: print(span.name, span.duration))
+    async with Client(url, tracer=tracer) as client:
+        ...
+    print(tracer.prometheus())
+
+    HTTP requests are traced through an aiohttp TraceConfig, and operations
+    record submit, wait and websocket job spans. Latencies are aggregated in
+    histograms per span name and endpoint, with names in urls replaced by
+    {name}, so /1.0/containers/web1 and /1.0/containers/web2 are aggregated
+    together. When the client has no tracer, nothing is recorded at all.
+
+    Members:
+        histograms (dict): Latency Histogram by (span name, method, endpoint).
+        statuses (Counter): Number of requests by (method, endpoint, status).
+        bytes_sent (Counter): Request body bytes by (method, endpoint).
+        bytes_received (Counter): Response body bytes by (method, endpoint).
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize the tracer.
+
+        Args:
+            buckets (tuple): Latency histograms buckets upper bounds.
+
+        """
+        self.histograms = defaultdict(lambda: Histogram(buckets))
+        self.statuses = Counter()
+        self.bytes_sent = Counter()
+        self.bytes_received = Counter()
+        self._callbacks = []
+
+    def add_callback(self, callback):
+        """Register a function called with each finished Span."""
+        self._callbacks.append(callback)
+
+    def span(self, name, url, **attributes):
+        """Return a Span, to be used as a context manager."""
+        return Span(self, name, url, attributes)
+
+    def record(self, span):
+        """Aggregate a finished span, and pass it to the callbacks."""
+        method = span.attributes.get('method', '')
+        self.histograms[(span.name, method, span.endpoint)].observe(
+            span.duration
+        )
+        if span.name == HTTP_REQUEST:
+            key = (method, span.endpoint)
+            self.statuses[key + (span.attributes.get('status'),)] += 1
+            self.bytes_sent[key] += span.attributes.get('bytes_sent', 0)
+            self.bytes_received[key] += span.attributes.get(
+                'bytes_received',
+                0
+            )
+
+        for callback in self._callbacks:
+            callback(span)
+
+    def trace_config(self):
+        """Return an aiohttp TraceConfig recording HTTP request spans.
+
+        aiohttp signals the end of a request once the response headers are
+        received, before the body is read. When a request is sent with a
+        dict as trace_request_ctx, the span is stored in it under 'span'
+        instead of being finished then, so the caller can finish it once the
+        body was read, and the span covers the whole response.
+        """
+        config = TraceConfig()
+
+        async def _on_request_start(_, context, params):
+            context.span = self.span(
+                HTTP_REQUEST,
+                params.url.path_qs,
+                method=params.method.lower(),
+                bytes_sent=0,
+                bytes_received=0
+            )
+            if isinstance(context.trace_request_ctx, dict):
+                context.trace_request_ctx['span'] = context.span
+
+        async def _on_chunk_sent(_, context, params):
+            context.span.attributes['bytes_sent'] += len(params.chunk)
+
+        async def _on_chunk_received(_, context, params):
+            context.span.attributes['bytes_received'] += len(params.chunk)
+
+        async def _on_request_end(_, context, params):
+            context.span.attributes['status'] = params.response.status
+            if not isinstance(context.trace_request_ctx, dict):
+                context.span.finish()
+
+        async def _on_request_exception(_, context, params):
+            context.span.attributes['status'] = 'error'
+            context.span.attributes['error'] = type(params.exception).__name__
+            context.span.finish()
+
+        config.on_request_start.append(_on_request_start)
+        config.on_request_chunk_sent.append(_on_chunk_sent)
+        config.on_response_chunk_received.append(_on_chunk_received)
+        config.on_request_end.append(_on_request_end)
+        config.on_request_exception.append(_on_request_exception)
+        return config
+
+    def prometheus(self, prefix='aiolxd'):
+        """Return a snapshot of the metrics in Prometheus text format."""
+        lines = []
+        name = '%s_duration_seconds' % prefix
+        lines.append('# HELP %s Latency of LXD requests and operation '
+                     'steps.' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for ((span, method, endpoint), histogram) in sorted(
+                self.histograms.items()):
+            labels = 'span="%s",method="%s",endpoint="%s"' % (
+                span,
+                method,
+                _escape(endpoint)
+            )
+            for (bound, count) in histogram.cumulative_counts():
+                lines.append('%s_bucket{%s,le="%s"} %d' % (
+                    name,
+                    labels,
+                    '+Inf' if bound == float('inf') else repr(bound),
+                    count
+                ))
+            lines.append('%s_sum{%s} %r' % (name, labels, histogram.sum))
+            lines.append('%s_count{%s} %d' % (name, labels, histogram.count))
+
+        name = '%s_requests_total' % prefix
+        lines.append('# HELP %s LXD requests by response status.' % name)
+        lines.append('# TYPE %s counter' % name)
+        for ((method, endpoint, status), count) in sorted(
+                self.statuses.items(), key=str):
+            lines.append('%s{method="%s",endpoint="%s",status="%s"} %d' % (
+                name,
+                method,
+                _escape(endpoint),
+                status,
+                count
+            ))
+
+        for (counter, suffix, description) in [
+                (self.bytes_sent, 'sent', 'Request body bytes.'),
+                (self.bytes_received, 'received', 'Response body bytes.'),
+        ]:
+            name = '%s_bytes_%s_total' % (prefix, suffix)
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s counter' % name)
+            for ((method, endpoint), count) in sorted(counter.items()):
+                lines.append('%s{method="%s",endpoint="%s"} %d' % (
+                    name,
+                    method,
+                    _escape(endpoint),
+                    count
+                ))
+
+        return '\n'.join(lines) + '\n'
+
+
+def get_endpoint(url):
+    """Return the endpoint template of an url.
+
+    Query strings are dropped, and object names replaced by {name}, i.e
+    /1.0/containers/web1/logs/exec.stdout becomes
+    /1.0/containers/{name}/logs/{name}.
+    """
+    segments = url.split('?', 1)[0].strip('/').split('/')
+    for index in range(2, len(segments), 2):
+        segments[index] = '{name}'
+    return '/' + '/'.join(segments)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
@@ -1,5 +1,9 @@
 """lxdaio common utilites & helper classes."""
 
+# Long polling urls, whose latency doesn't reflect the daemon load.
+_LONG_POLL_PATHS = ('/1.0/events',)
+_LONG_POLL_SUFFIXES = ('/wait',)
+
 
 def kwargs_to_lxd(**kwargs):
     """Convert python arguments to a dict with proper key names for LXD."""
@@ -9,3 +13,12 @@ def kwargs_to_lxd(**kwargs):
         result[lxd_key] = value
 
     return result
+
+
+def is_long_poll(url):
+    """Return True if url is a long poll, like operation waits."""
+    path = url.split('?', 1)[0]
+    return (
+        path.startswith(_LONG_POLL_PATHS) or
+        path.endswith(_LONG_POLL_SUFFIXES)
+    )
@@ -20,6 +20,8 @@ class Certificates(Collection):
 
     url = '/1.0/certificates'
     child_class = Certificate
+    child_key = 'fingerprint'
+    recursion = 1
 
     async def add(self, password=None, cert_path=None, name=None):
         """Add a trusted certificate to the server.
@@ -40,7 +42,7 @@ class Certificates(Collection):
         }
 
         if cert_path is None:
-            cert_path = self._client.config.client_cert
+            cert_path = self._client.client_cert
 
         with open(cert_path, 'rb') as cert_file:
             cert_string = cert_file.read().decode('utf-8')
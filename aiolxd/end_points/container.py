@@ -1,8 +1,20 @@
 """1.0/container/{name} LXD API endpoint."""
+from asyncio import ensure_future
+from asyncio import shield
+
 from aiolxd.core.api_object import ApiObject
 from aiolxd.core.operation import Operation
+from aiolxd.core.scheduler import NORMAL
+from aiolxd.core.streams import DEFAULT_FLUSH_INTERVAL
+from aiolxd.core.streams import DEFAULT_FRAME_SIZE
+from aiolxd.core.streams import DEFAULT_LIMIT
+from aiolxd.core.streams import WebsocketReader
+from aiolxd.core.streams import WebsocketWriter
 
 from aiolxd.core.utils import kwargs_to_lxd
+from aiolxd.end_points.files import Files
+from aiolxd.end_points.tree import pull_tree
+from aiolxd.end_points.tree import push_tree
 
 
 class Exec(Operation):
@@ -10,6 +22,15 @@ class Exec(Operation):
 
     This will map stdin, stderr and stdin websockets to given streams, and wait
     until the command is terminated.
+
+    With record_output, no websocket is opened : LXD records the command
+    output in log files, that are only downloaded when read through stdout_log
+    or stderr_log. It's the cheapest way to run a batch command.
+
+    Members:
+        return_code (int): Command exit code, None until the operation was
+                           awaited.
+
     """
 
     def __init__(
@@ -21,6 +42,10 @@ class Exec(Operation):
             stdin=None,
             stdout=None,
             stderr=None,
+            frame_size=DEFAULT_FRAME_SIZE,
+            flush_interval=DEFAULT_FLUSH_INTERVAL,
+            record_output=False,
+            priority=NORMAL,
             **kwargs):
         """Initialize the Exec operation.
 
@@ -30,9 +55,22 @@ class Exec(Operation):
             command (array) : Command to execute, in a Popen-like format.
             environment (dict) : Key-value pair of environment variables.
             stdin (async function) : Asynchronous generator yielding string or
-                                     byte arrays that are sent to stdin.
-            stdout (async function) : Function taking a byte array as parameter.
-            stderr (async function) : Function taking a byte array as parameter.
+                                     byte arrays that are sent to stdin, or
+                                     a WebsocketWriter.
+            stdout (async function) : Function taking a byte array as
+                                      parameter, or a WebsocketReader.
+            stderr (async function) : Function taking a byte array as
+                                      parameter, or a WebsocketReader.
+            frame_size (int) : Data yielded by the stdin generator is
+                               coalesced in websocket messages of up to
+                               frame_size bytes.
+            flush_interval (float) : Delay in seconds after which a partial
+                                     stdin message is sent.
+            record_output (bool) : Record stdout and stderr in LXD log files
+                                   instead of streaming them. Can't be used
+                                   with stdin, stdout or stderr.
+            priority (int) : Priority class of the exec requests, see
+                             aiolxd.core.scheduler.
             **kwargs (dict) : Additional parameter to send to the LXD exec
                               command (see LXD API documentation.)
 
@@ -42,36 +80,217 @@ class Exec(Operation):
             "command": list(command),
             "environment": environment,
             "wait-for-websocket": True,
-            "record-output": False,
+            "record-output": record_output,
             "interactive": False,
         })
 
         if stdout is None and stderr is None and stdin is None:
             data['wait-for-websocket'] = False
 
-        super().__init__(client, 'post', container_url + '/exec', data)
+        assert not (record_output and data['wait-for-websocket']), \
+            'record_output can\'t be used with stdin, stdout or stderr'
+
+        super().__init__(
+            client,
+            'post',
+            container_url + '/exec',
+            data,
+            priority=priority
+        )
 
         self._stdout = stdout
         self._stderr = stderr
         self._stdin = stdin
+        self._frame_size = frame_size
+        self._flush_interval = flush_interval
+        self._output = {}
+        self.return_code = None
+
+    def __await__(self):
+        """Await until the command is terminated.
+
+        Returns the operation metadata, the exit code being set in
+        return_code.
+        """
+        result = yield from super().__await__()
+        metadata = (result or {}).get('metadata') or {}
+        self.return_code = metadata.get('return')
+        self._output = metadata.get('output') or {}
+        return result
+
+    def stdout_log(self, chunk_size=DEFAULT_LIMIT):
+        """Return an async iterator on the recorded standard output.
+
+        Only available with record_output, once the operation was awaited.
+        The log is downloaded chunk by chunk while it's iterated.
+
+        Args:
+            chunk_size (int) : Maximum size of yielded chunks.
+
+        """
+        return self._read_log('1', chunk_size)
+
+    def stderr_log(self, chunk_size=DEFAULT_LIMIT):
+        """Return an async iterator on the recorded standard error.
+
+        See stdout_log.
+        """
+        return self._read_log('2', chunk_size)
+
+    def _read_log(self, fd, chunk_size):
+        assert self._data['record-output'], 'Output was not recorded'
+        assert self.return_code is not None, 'Command is not terminated'
+        return self._client.download(
+            self._output[fd],
+            chunk_size,
+            priority=self._priority
+        )
 
     def _get_jobs(self, metadata):
+        if not self._data['wait-for-websocket']:
+            return
+
         websockets = metadata['fds']
-        yield self._write_websocket(websockets['0'], self._stdin)
-        yield self._read_websocket(websockets['1'], self._stdout)
-        yield self._read_websocket(websockets['2'], self._stderr)
+        yield self._write_websocket(
+            websockets['0'],
+            self._stdin,
+            self._frame_size,
+            self._flush_interval
+        )
+        yield self._read_stream(websockets['1'], self._stdout)
+        yield self._read_stream(websockets['2'], self._stderr)
         yield self._control_websocket(websockets['control'])
 
+    async def _read_stream(self, secret, stream):
+        if not isinstance(stream, WebsocketReader):
+            await self._read_websocket(secret, stream)
+            return
+
+        try:
+            await self._read_websocket(secret, stream.feed)
+        finally:
+            stream.feed_eof()
+
+
+class ExecProcess:
+    """A command running in a container, with stream-like standard streams.
+
+    Mirrors asyncio.subprocess.Process : stdin has the asyncio.StreamWriter
+    writing methods, stdout and stderr the asyncio.StreamReader reading
+    methods. Buffers are bounded, so a slow reader throttles the command
+    output websocket instead of buffering it in memory. Both stdout and
+    stderr must be consumed, else the command can block when a buffer is
+    full.
+
+    Members:
+        stdin (aiolxd.core.streams.WebsocketWriter): Command standard input.
+                                                     Close it to signal EOF.
+        stdout (aiolxd.core.streams.WebsocketReader): Command standard output.
+        stderr (aiolxd.core.streams.WebsocketReader): Command standard error.
+        returncode (int): Command exit code, None while it's running.
+
+    """
+
+    def __init__(self, client, container_url, command, environment=None,
+                 limit=DEFAULT_LIMIT, **kwargs):
+        """Start the command.
+
+        Args:
+            client (aiolxd.Client) : The LXD client
+            container_url (str) : Url to the container endpoint.
+            command (array) : Command to execute, in a Popen-like format.
+            environment (dict) : Key-value pair of environment variables.
+            limit (int) : Size of the stdin, stdout and stderr buffers.
+            **kwargs (dict) : Forwarded to the Exec operation, see Exec
+                              constructor for available values.
+
+        """
+        self.stdin = WebsocketWriter(limit)
+        self.stdout = WebsocketReader(limit)
+        self.stderr = WebsocketReader(limit)
+        self.returncode = None
+        operation = Exec(
+            client,
+            container_url,
+            command,
+            environment,
+            stdin=self.stdin,
+            stdout=self.stdout,
+            stderr=self.stderr,
+            **kwargs
+        )
+        self._task = ensure_future(self._run(operation))
+
+    async def wait(self):
+        """Wait for the command to terminate, and return its exit code."""
+        return await shield(self._task)
+
+    async def _run(self, operation):
+        try:
+            await operation
+        finally:
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+
+        self.returncode = operation.return_code
+        return self.returncode
+
 
 class Container(ApiObject):
     """/1.0/containers/{name} LXD API end point."""
 
+    @property
+    def files(self):
+        """Get the files endpoint of this container."""
+        return Files(self._client, self.url, priority=self.priority)
+
     def exec(self, *args, **kwargs):
         """Execute a command on this container.
 
         Args:
            *args, **kwargs : Forwarded to the Exec operation. See Exec
                               operation constructor for available values.
+                              The priority defaults to the container one.
 
         """
+        kwargs.setdefault('priority', self.priority)
         return Exec(self._client, self.url, *args, **kwargs)
+
+    async def push_tree(self, local_dir, remote_dir, compress=False):
+        """Copy a local directory content to a directory of this container.
+
+        See aiolxd.end_points.tree.push_tree.
+        """
+        return await push_tree(self, local_dir, remote_dir, compress)
+
+    async def pull_tree(self, remote_dir, local_dir, compress=False):
+        """Copy a directory content of this container to a local directory.
+
+        See aiolxd.end_points.tree.pull_tree.
+        """
+        return await pull_tree(self, remote_dir, local_dir, compress)
+
+    async def spawn(self, command, environment=None, limit=DEFAULT_LIMIT,
+                    **kwargs):
+        """Start a command on this container, and return an ExecProcess.
+
+        Unlike exec, the command standard streams are exposed as stream-like
+        objects, see ExecProcess.
+
+        Args:
+            command (array) : Command to execute, in a Popen-like format.
+            environment (dict) : Key-value pair of environment variables.
+            limit (int) : Size of the stdin, stdout and stderr buffers.
+            **kwargs (dict) : Forwarded to the Exec operation. The priority
+                              defaults to the container one.
+
+        """
+        kwargs.setdefault('priority', self.priority)
+        return ExecProcess(
+            self._client,
+            self.url,
+            command,
+            environment,
+            limit,
+            **kwargs
+        )
@@ -1,6 +1,201 @@
 """1.0/containers LXD API endpoint."""
+from asyncio import FIRST_COMPLETED
+from asyncio import TimeoutError  # pylint: disable=redefined-builtin
+from asyncio import ensure_future
+from asyncio import gather
+from asyncio import wait
+from asyncio import wait_for
+from collections import Counter
+from time import monotonic
+
 from aiolxd.core.collection import Collection
 from aiolxd.end_points.container import Container
+from aiolxd.end_points.container import Exec
+
+
+class ExecResult:
+    """Result of a command ran on one container by Containers.exec_many.
+
+    Members:
+        name (str): Name of the container.
+        return_code (int): Exit code of the command, None if it failed to run
+                           or timed out.
+        stdout (bytes): Command standard output, None if it wasn't captured.
+        stderr (bytes): Command standard error, None if it wasn't captured.
+        duration (float): Time taken by the command, in seconds.
+        error (Exception): Error raised while running the command, None if
+                           it ran to completion.
+
+    """
+
+    def __init__(self, name):
+        """Initialize the result of the command ran on container name."""
+        self.name = name
+        self.return_code = None
+        self.stdout = None
+        self.stderr = None
+        self.duration = 0.0
+        self.error = None
+
+    @property
+    def succeeded(self):
+        """Return True if the command ran and exited with status 0."""
+        return self.error is None and self.return_code == 0
+
+    @property
+    def timed_out(self):
+        """Return True if the command was interrupted by the timeout."""
+        return isinstance(self.error, TimeoutError)
+
+
+class ExecSummary:
+    """Aggregated results of a Containers.exec_many run.
+
+    Members:
+        results (list): ExecResult of each finished container, in completion
+                        order.
+        return_codes (Counter): Number of containers by command exit code.
+        duration (float): Time elapsed since the run started, in seconds.
+
+    """
+
+    def __init__(self):
+        """Initialize an empty summary."""
+        self.results = []
+        self.return_codes = Counter()
+        self.duration = 0.0
+
+    @property
+    def succeeded(self):
+        """Return the results of commands that exited with status 0."""
+        return [it for it in self.results if it.succeeded]
+
+    @property
+    def failed(self):
+        """Return the results of commands that didn't exit with status 0."""
+        return [it for it in self.results if not it.succeeded]
+
+    @property
+    def timed_out(self):
+        """Return the results of commands interrupted by the timeout."""
+        return [it for it in self.results if it.timed_out]
+
+    @property
+    def max_duration(self):
+        """Return the duration of the slowest command."""
+        return max((it.duration for it in self.results), default=0.0)
+
+    @property
+    def mean_duration(self):
+        """Return the mean duration of commands."""
+        if not self.results:
+            return 0.0
+        return sum(it.duration for it in self.results) / len(self.results)
+
+    def add(self, result):
+        """Add the result of a container to this summary."""
+        self.results.append(result)
+        if result.return_code is not None:
+            self.return_codes[result.return_code] += 1
+
+
+class ExecMany:
+    """The same command running on several containers.
+
+    Iterate it with async for to get each container ExecResult as soon as
+    its command finishes. Commands run at most concurrency at a time, and
+    those still running are cancelled if the iteration is interrupted. Note
+    that cancelling a command, or reaching its timeout, stops waiting for it
+    but doesn't kill the process in the container.
+
+    Members:
+        summary (ExecSummary): Aggregated results, updated while iterating.
+
+    """
+
+    def __init__(self, client, targets, command, concurrency, timeout,
+                 capture_output, **kwargs):
+        """Initialize the run.
+
+        Args:
+            client (aiolxd.Client): The LXD client.
+            targets (dict): Container urls by container name.
+            command (array): Command to execute, in a Popen-like format.
+            concurrency (int): Maximum number of commands running at once.
+            timeout (float): Maximum time in seconds a command can take, None
+                             to wait indefinitely.
+            capture_output (bool): Weither to capture stdout and stderr.
+            **kwargs (dict): Forwarded to the Exec operation.
+
+        """
+        self._client = client
+        self._targets = targets
+        self._command = command
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._capture_output = capture_output
+        self._kwargs = kwargs
+        self.summary = ExecSummary()
+
+    async def __aiter__(self):
+        """Yield ExecResult of each container, as commands finish."""
+        start = monotonic()
+        targets = list(self._targets.items())
+        running = set()
+        try:
+            while targets or running:
+                while targets and len(running) < self._concurrency:
+                    (name, url) = targets.pop(0)
+                    running.add(ensure_future(self._run(name, url)))
+
+                (done, running) = await wait(
+                    running,
+                    return_when=FIRST_COMPLETED
+                )
+                for task in done:
+                    result = task.result()
+                    self.summary.add(result)
+                    self.summary.duration = monotonic() - start
+                    yield result
+        finally:
+            for task in running:
+                task.cancel()
+            await gather(*running, return_exceptions=True)
+
+    async def wait(self):
+        """Run the command on all containers, and return the summary."""
+        async for _ in self:
+            pass
+        return self.summary
+
+    async def _run(self, name, url):
+        result = ExecResult(name)
+        kwargs = dict(self._kwargs)
+        if self._capture_output:
+            stdout = bytearray()
+            stderr = bytearray()
+            kwargs['stdout'] = _append_to(stdout)
+            kwargs['stderr'] = _append_to(stderr)
+
+        start = monotonic()
+        try:
+            operation = Exec(self._client, url, self._command, **kwargs)
+            await wait_for(operation, self._timeout)
+            result.return_code = operation.return_code
+        except Exception as error:  # pylint: disable=broad-except
+            result.error = error
+        result.duration = monotonic() - start
+
+        if self._capture_output:
+            result.stdout = bytes(stdout)
+            result.stderr = bytes(stderr)
+        return result
+
+
+def _append_to(buffer):
+    async def _append(data):
+        buffer.extend(data)
+    return _append
 
 
 class Containers(Collection):
@@ -8,3 +203,46 @@ class Containers(Collection):
 
     url = '/1.0/containers'
     child_class = Container
+    recursion = 1
+
+    def exec_many(self, command, names=None, concurrency=10, timeout=None,
+                  capture_output=False, **kwargs):
+        """Run a command on several containers, in parallel.
+
+        async with client.api.containers as containers:
+            run = containers.exec_many(['uptime'], concurrency=20, timeout=10)
+            async for result in run:
+                print(result.name, result.return_code)
+            print(len(run.summary.failed))
+
+        Args:
+            command (array): Command to execute, in a Popen-like format.
+            names (list): Names of the containers to run the command on. If
+                          None, the command is ran on all containers of this
+                          collection, which must then be loaded.
+            concurrency (int): Maximum number of commands running at once.
+            timeout (float): Maximum time in seconds a command can take, None
+                             to wait indefinitely.
+            capture_output (bool): Weither to capture stdout and stderr.
+            **kwargs (dict): Forwarded to the Exec operation, see Exec
+                             constructor for available values. The priority
+                             defaults to the collection one, pass BULK for
+                             fleet-wide commands that can wait behind
+                             interactive requests.
+
+        """
+        kwargs.setdefault('priority', self.priority)
+        if names is None:
+            targets = {it.rsplit('/', 1)[-1]: it for it in self._children}
+        else:
+            targets = {it: self._child_url(it) for it in names}
+
+        return ExecMany(
+            self._client,
+            targets,
+            command,
+            concurrency,
+            timeout,
+            capture_output,
+            **kwargs
+        )
@@ -0,0 +1,263 @@
+"""Pool of long-lived shells, running short commands in containers."""
+from asyncio import Lock
+from asyncio import ensure_future
+from asyncio import gather
+from collections import OrderedDict
+from time import monotonic
+from uuid import uuid4
+
+from aiolxd.core.streams import DEFAULT_LIMIT
+from aiolxd.end_points.container import ExecProcess
+
+DEFAULT_SHELL = ('sh',)
+
+_SCRIPT = (
+    "eval '{command}' </dev/null 2>/dev/null\n"
+    "printf '\\n%s %d\\n' '{marker}' \"$?\"\n"
+)
+
+
+class SessionError(Exception):
+    """Raised when an exec session shell terminated unexpectedly."""
+
+
+class SessionResult:
+    """Result of a command ran through an ExecSession.
+
+    Members:
+        stdout (bytes): Command standard output.
+        return_code (int): Command exit code.
+
+    """
+
+    def __init__(self, stdout, return_code):
+        """Initialize the result."""
+        self.stdout = stdout
+        self.return_code = return_code
+
+
+class ExecSession:
+    """A shell kept running in a container, to run commands through it.
+
+    Running a command through an existing shell avoids creating an LXD
+    operation, four websockets and a process for each command. Commands are
+    written to the shell stdin, each followed by a printf of a random marker
+    and the command exit code, which delimits the command output.
+
+    Commands run one at a time, with stdin redirected from /dev/null and
+    stderr discarded. A command exiting the shell terminates the session. If
+    a run is interrupted, i.e cancelled by a timeout, the session is closed,
+    as the output of the interrupted command would be read as the output of
+    the next one.
+
+    Members:
+        last_used (float): time.monotonic() value when the session was last
+                           used.
+
+    """
+
+    def __init__(self, client, container_url, shell=DEFAULT_SHELL):
+        """Start the shell.
+
+        Args:
+            client (aiolxd.Client): The LXD client.
+            container_url (str): Url of the container running the shell.
+            shell (array): Shell command, in a Popen-like format.
+
+        """
+        self._process = ExecProcess(client, container_url, list(shell))
+        self._lock = Lock()
+        self._buffer = bytearray()
+        self._closed = False
+        self._stderr_task = ensure_future(_discard(self._process.stderr))
+        self.last_used = monotonic()
+
+    @property
+    def alive(self):
+        """Return True if the shell is still running."""
+        if self._closed or self._process.returncode is not None:
+            return False
+        # Stdout is at EOF if the exec operation failed.
+        return not self._process.stdout.at_eof()
+
+    async def run(self, command):
+        """Run a shell command, and return a SessionResult.
+
+        Raises:
+            SessionError: If the shell terminated before the command did.
+
+        """
+        # A session running a long command isn't idle.
+        self.last_used = monotonic()
+        async with self._lock:
+            if not self.alive:
+                raise SessionError('Session is closed')
+
+            marker = 'aiolxd_%s' % uuid4().hex
+            script = _SCRIPT.format(
+                command=command.replace("'", "'\\''"),
+                marker=marker
+            )
+            try:
+                self._process.stdin.write(script.encode('utf-8'))
+                await self._process.stdin.drain()
+                result = await self._read_result(marker.encode('utf-8'))
+            except BaseException:
+                # The shell exits once the interrupted command is finished.
+                self._closed = True
+                self._process.stdin.close()
+                raise
+
+            self.last_used = monotonic()
+            return result
+
+    async def close(self):
+        """Terminate the shell, once the running command is finished."""
+        async with self._lock:
+            self._closed = True
+            self._process.stdin.close()
+            await self._process.wait()
+            await self._stderr_task
+
+    async def _read_result(self, marker):
+        delimiter = b'\n' + marker + b' '
+        stdout = self._process.stdout
+        while True:
+            start = self._buffer.find(delimiter)
+            if start != -1:
+                end = self._buffer.find(b'\n', start + len(delimiter))
+                if end != -1:
+                    output = bytes(self._buffer[:start])
+                    return_code = int(self._buffer[start + len(delimiter):end])
+                    del self._buffer[:end + 1]
+                    return SessionResult(output, return_code)
+
+            data = await stdout.read(DEFAULT_LIMIT)
+            if not data:
+                self._closed = True
+                await self._raise_terminated()
+            self._buffer.extend(data)
+
+    async def _raise_terminated(self):
+        try:
+            await self._process.wait()
+        except Exception as error:
+            # The exec request itself failed, i.e the container is missing.
+            raise SessionError('Shell terminated') from error
+        raise SessionError('Shell terminated')
+
+
+async def _discard(reader):
+    # Something written on the shell stderr must not fill its buffer and
+    # block the shell.
+    while await reader.read(DEFAULT_LIMIT):
+        pass
+
+
+class ExecSessionPool:
+    """Pool of ExecSession, one per container.
+
+    async with ExecSessionPool(client) as pool:
+        result = await pool.run(container, 'cat /proc/loadavg')
+
+    Sessions not used for more than idle_timeout seconds are closed when the
+    pool is used, and when max_size sessions are open, the least recently
+    used one is closed to open a new one. Evicted sessions, and sessions
+    terminated by a failed or interrupted command, are closed in the
+    background once their running command is finished, and awaited when the
+    pool is closed.
+    """
+
+    def __init__(self, client, max_size=16, idle_timeout=60.0,
+                 shell=DEFAULT_SHELL):
+        """Initialize the pool.
+
+        Args:
+            client (aiolxd.Client): The LXD client.
+            max_size (int): Maximum number of open sessions.
+            idle_timeout (float): Time in seconds after which an unused
+                                  session is closed.
+            shell (array): Shell command, in a Popen-like format.
+
+        """
+        self._client = client
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._shell = shell
+        self._sessions = OrderedDict()
+        self._closing = set()
+
+    def __len__(self):
+        """Return the number of open sessions."""
+        return len(self._sessions)
+
+    async def run(self, container, command):
+        """Run a shell command on a container, and return a SessionResult.
+
+        Args:
+            container (Container or str): The container, or its url.
+            command (str): Shell command to run.
+
+        """
+        url = container if isinstance(container, str) else container.url
+        await self.evict_idle()
+
+        # The session is registered before any await, so concurrent runs on
+        # the same container share it.
+        session = self._sessions.pop(url, None)
+        if session is not None and not session.alive:
+            self._close_later(session)
+            session = None
+        if session is None:
+            session = ExecSession(self._client, url, self._shell)
+        self._sessions[url] = session
+
+        while len(self._sessions) > self._max_size:
+            self._close_later(self._sessions.popitem(last=False)[1])
+
+        try:
+            return await session.run(command)
+        except BaseException:
+            if not session.alive:
+                if self._sessions.get(url) is session:
+                    del self._sessions[url]
+                self._close_later(session)
+            raise
+
+    async def evict_idle(self):
+        """Close sessions unused for more than idle_timeout seconds."""
+        limit = monotonic() - self._idle_timeout
+        for (url, session) in list(self._sessions.items()):
+            if session.last_used < limit:
+                del self._sessions[url]
+                self._close_later(session)
+
+    async def close(self):
+        """Close all sessions."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
+
+        while self._closing:
+            await gather(*self._closing, return_exceptions=True)
+
+    def _close_later(self, session):
+        task = ensure_future(session.close())
+        self._closing.add(task)
+        task.add_done_callback(self._on_closed)
+
+    def _on_closed(self, task):
+        self._closing.discard(task)
+        # Errors of a session that already failed aren't relevant anymore.
+        if not task.cancelled():
+            task.exception()
+
+    async def __aenter__(self):
+        """Enter a context, returning this pool."""
+        return self
+
+    async def __aexit__(self, exception_type, exception, traceback):
+        """Exit a context, closing all sessions."""
+        await self.close()
+        return False
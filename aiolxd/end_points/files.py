@@ -0,0 +1,123 @@
+"""1.0/containers/{name}/files LXD API endpoint."""
+from mmap import ACCESS_READ
+from mmap import mmap
+from os import PathLike
+from pathlib import Path
+from urllib.parse import quote
+
+from aiolxd.core.scheduler import NORMAL
+
+DEFAULT_CHUNK_SIZE = 2 ** 20
+
+
+class Files:
+    """/1.0/containers/{name}/files LXD API end point.
+
+    Files are streamed chunk by chunk in both directions, so they are never
+    fully loaded in memory :
+
+    await container.files.push('/etc/app.conf', Path('app.conf'), mode=0o644)
+    await container.files.pull('/var/log/app.log', Path('app.log'))
+    async for chunk in container.files.iter('/var/log/app.log'):
+        ...
+
+    """
+
+    def __init__(self, client, container_url, chunk_size=DEFAULT_CHUNK_SIZE,
+                 priority=NORMAL):
+        """Initialize the endpoint.
+
+        Args:
+            client (aiolxd.Client) : The LXD client.
+            container_url (str) : Url to the container endpoint.
+            chunk_size (int) : Size of the chunks read from local files and
+                               from LXD responses.
+            priority (int) : Priority class of the transfers, see
+                             aiolxd.core.scheduler.
+
+        """
+        self._client = client
+        self._container_url = container_url
+        self._chunk_size = chunk_size
+        self._priority = priority
+
+    async def push(self, path, source, uid=None, gid=None, mode=None):
+        """Upload a file to the container.
+
+        Args:
+            path (str) : Path of the file in the container.
+            source (Path, bytes or async iterable) : Local file path, data, or
+                                                     asynchronous iterable
+                                                     yielding bytes-like
+                                                     chunks. Local files are
+                                                     memory-mapped and sent
+                                                     without copy.
+            uid (int) : Owner user id of the file.
+            gid (int) : Owner group id of the file.
+            mode (int) : Permissions of the file, i.e 0o644.
+
+        """
+        headers = {'X-LXD-type': 'file'}
+        if uid is not None:
+            headers['X-LXD-uid'] = str(uid)
+        if gid is not None:
+            headers['X-LXD-gid'] = str(gid)
+        if mode is not None:
+            headers['X-LXD-mode'] = '%04o' % mode
+
+        if isinstance(source, (str, PathLike)):
+            source = _read_file(Path(source), self._chunk_size)
+
+        response = await self._client.upload(
+            self._url(path),
+            source,
+            headers,
+            self._priority
+        )
+        return response.data
+
+    async def pull(self, path, target):
+        """Download a file from the container.
+
+        Args:
+            path (str) : Path of the file in the container.
+            target (Path or async function) : Local file path, or function
+                                              taking a bytes chunk as
+                                              parameter.
+
+        """
+        if not isinstance(target, (str, PathLike)):
+            async for chunk in self.iter(path):
+                await target(chunk)
+            return
+
+        with open(target, 'wb') as target_file:
+            async for chunk in self.iter(path):
+                target_file.write(chunk)
+
+    def iter(self, path):
+        """Return an async iterator on the chunks of a container file."""
+        return self._client.download(
+            self._url(path),
+            self._chunk_size,
+            priority=self._priority
+        )
+
+    def _url(self, path):
+        return '%s/files?path=%s' % (self._container_url, quote(path))
+
+
+async def _read_file(path, chunk_size):
+    with open(path, 'rb') as source_file:
+        # Empty files can't be memory-mapped.
+        if not path.stat().st_size:
+            return
+
+        mapping = mmap(source_file.fileno(), 0, access=ACCESS_READ)
+
+    # The sender may still hold the last chunk when this generator ends, so
+    # the mapping isn't closed explicitly : it's unmapped once all chunks
+    # were released.
+    view = memoryview(mapping)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
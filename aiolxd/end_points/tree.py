@@ -0,0 +1,304 @@
+"""Directory tree transfers, streaming tar archives over exec."""
+from asyncio import ensure_future
+from asyncio import gather
+from asyncio import get_event_loop
+from asyncio import run_coroutine_threadsafe
+from os.path import commonpath
+from os.path import dirname
+from os.path import isabs
+from os.path import join
+from os.path import realpath
+from time import monotonic
+import tarfile
+
+from aiolxd.core.streams import DEFAULT_LIMIT
+
+# Size of the blocks tarfile reads and writes.
+_TAR_BUFFER_SIZE = 2 ** 16
+
+
+class TransferError(Exception):
+    """Raised when the tar command failed in the container.
+
+    Members:
+        return_code (int): Exit code of the tar command.
+        stderr (bytes): Standard error of the tar command.
+
+    """
+
+    def __init__(self, return_code, stderr):
+        """Initialize the error."""
+        super().__init__(
+            'tar exited with code %s : %s' %
+            (return_code, stderr.decode('utf-8', 'replace').strip())
+        )
+        self.return_code = return_code
+        self.stderr = stderr
+
+
+class UnsafeMemberError(tarfile.TarError):
+    """Raised when a pulled archive member would be written outside the target.
+
+    Only raised on Python versions without tarfile extraction filters, which
+    raise their own tarfile.FilterError instead.
+
+    Members:
+        member (tarfile.TarInfo): The rejected member.
+
+    """
+
+    def __init__(self, member, reason):
+        """Initialize the error."""
+        super().__init__('%s %s' % (member.name, reason))
+        self.member = member
+
+
+class TransferStats:
+    """Statistics of a tree transfer.
+
+    Members:
+        bytes (int): Size of the transferred archive, compressed if
+                     compression was enabled.
+        duration (float): Transfer duration, in seconds.
+
+    """
+
+    def __init__(self, size, duration):
+        """Initialize the statistics."""
+        self.bytes = size
+        self.duration = duration
+
+    @property
+    def bytes_per_second(self):
+        """Return the archive transfer rate."""
+        if not self.duration:
+            return 0.0
+        return self.bytes / self.duration
+
+
+async def push_tree(container, local_dir, remote_dir, compress=False):
+    """Copy a local directory content to a container directory.
+
+    The tar archive is generated on the fly in a thread, and streamed to a tar
+    command running in the container : no temporary file is written, and only
+    one exec operation is created, whatever the number of files.
+
+    Args:
+        container (aiolxd.end_points.container.Container) : The container.
+        local_dir (Path) : Local directory to copy.
+        remote_dir (str) : Existing container directory to copy to.
+        compress (bool) : Compress the archive with gzip.
+
+    Returns:
+        TransferStats: The transfer statistics.
+
+    Raises:
+        TransferError: If tar failed in the container.
+        OSError: If a local file can't be read.
+
+    """
+    command = ['tar', '-x', '-C', remote_dir, '-f', '-']
+    if compress:
+        command.append('-z')
+
+    process = await container.spawn(command)
+    output = ensure_future(_read_output(process))
+    target = _ThreadWriter(get_event_loop(), process.stdin)
+    mode = 'w|gz' if compress else 'w|'
+    start = monotonic()
+    try:
+        await get_event_loop().run_in_executor(
+            None,
+            _write_archive,
+            target,
+            mode,
+            local_dir
+        )
+    except Exception:
+        # The archive error is reported instead of the tar one, but tar
+        # must still terminate.
+        process.stdin.close()
+        await gather(process.wait(), output, return_exceptions=True)
+        raise
+    finally:
+        process.stdin.close()
+
+    await _check(process, output)
+    return TransferStats(target.size, monotonic() - start)
+
+
+async def pull_tree(container, remote_dir, local_dir, compress=False):
+    """Copy a container directory content to a local directory.
+
+    The tar archive created by a tar command running in the container is
+    extracted on the fly in a thread, without temporary file.
+
+    Args:
+        container (aiolxd.end_points.container.Container) : The container.
+        remote_dir (str) : Container directory to copy.
+        local_dir (Path) : Existing local directory to copy to.
+        compress (bool) : Compress the archive with gzip.
+
+    Returns:
+        TransferStats: The transfer statistics.
+
+    Raises:
+        TransferError: If tar failed in the container.
+        tarfile.TarError: If the archive is invalid, or would write outside
+                          local_dir.
+
+    """
+    command = ['tar', '-c', '-C', remote_dir, '-f', '-']
+    if compress:
+        command.append('-z')
+    command.append('.')
+
+    process = await container.spawn(command)
+    process.stdin.close()
+    errors = ensure_future(process.stderr.read())
+    source = _ThreadReader(get_event_loop(), process.stdout)
+    mode = 'r|gz' if compress else 'r|'
+    start = monotonic()
+    try:
+        await get_event_loop().run_in_executor(
+            None,
+            _extract_archive,
+            source,
+            mode,
+            local_dir
+        )
+    except Exception:
+        # The extraction error is reported instead of the tar one, but tar
+        # must still terminate.
+        await _drain(process.stdout)
+        await gather(process.wait(), errors, return_exceptions=True)
+        raise
+
+    await _drain(process.stdout)
+    await _check(process, errors)
+    return TransferStats(source.size, monotonic() - start)
+
+
+async def _drain(reader):
+    # Consume the end of the archive, else tar would block.
+    while await reader.read(DEFAULT_LIMIT):
+        pass
+
+
+def _write_archive(target, mode, local_dir):
+    with tarfile.open(fileobj=target, mode=mode,
+                      bufsize=_TAR_BUFFER_SIZE) as archive:
+        archive.add(str(local_dir), arcname='.')
+
+
+def _extract_archive(source, mode, local_dir):
+    root = realpath(str(local_dir))
+    with tarfile.open(fileobj=source, mode=mode,
+                      bufsize=_TAR_BUFFER_SIZE) as archive:
+        # Don't trust paths and links in archives coming from containers.
+        if hasattr(tarfile, 'data_filter'):
+            archive.extractall(root, filter='data')
+            return
+
+        # Same checks as the data filter, for Python versions without it.
+        directories = []
+        for member in archive:
+            _check_member(member, root)
+            # Clear setuid, setgid, sticky and group / other write bits.
+            member.mode = member.mode & 0o755
+            # Ownership isn't restored, like with the data filter.
+            archive.extract(member, root, set_attrs=False)
+            path = join(root, member.name)
+            if member.isdir():
+                # Directories attributes are set last, as extractall does, so
+                # read-only directories can be filled first.
+                directories.append((member, path))
+            elif not member.issym():
+                archive.chmod(member, path)
+                archive.utime(member, path)
+
+        for (member, path) in reversed(directories):
+            archive.chmod(member, path)
+            archive.utime(member, path)
+
+
+def _check_member(member, root):
+    if member.isdev():
+        raise UnsafeMemberError(member, 'is a special file')
+
+    path = _resolve(root, root, member.name)
+    if path is None:
+        raise UnsafeMemberError(member, 'is outside the target directory')
+
+    if member.issym():
+        target = _resolve(root, dirname(path), member.linkname)
+    elif member.islnk():
+        target = _resolve(root, root, member.linkname)
+    else:
+        return
+
+    if target is None:
+        raise UnsafeMemberError(member, 'links outside the target directory')
+
+
+def _resolve(root, directory, name):
+    """Return the real path of name in directory, None if it's outside root.
+
+    Links already extracted are followed.
+    """
+    if isabs(name):
+        return None
+
+    path = realpath(join(directory, name))
+    if commonpath([root, path]) != root:
+        return None
+    return path
+
+
+async def _read_output(process):
+    # Both streams must be consumed, else tar could block.
+    stdout = ensure_future(process.stdout.read())
+    stderr = await process.stderr.read()
+    await stdout
+    return stderr
+
+
+async def _check(process, errors):
+    return_code = await process.wait()
+    stderr = await errors
+    if return_code != 0:
+        raise TransferError(return_code, stderr)
+
+
+class _ThreadWriter:
+    """File-like object writing to a WebsocketWriter from another thread."""
+
+    def __init__(self, loop, writer):
+        self._loop = loop
+        self._writer = writer
+        self.size = 0
+
+    def write(self, data):
+        future = run_coroutine_threadsafe(self._write(data), self._loop)
+        future.result()
+        self.size = self.size + len(data)
+        return len(data)
+
+    async def _write(self, data):
+        self._writer.write(data)
+        await self._writer.wait_writable()
+
+
+class _ThreadReader:
+    """File-like object reading a WebsocketReader from another thread."""
+
+    def __init__(self, loop, reader):
+        self._loop = loop
+        self._reader = reader
+        self.size = 0
+
+    def read(self, size=-1):
+        future = run_coroutine_threadsafe(self._reader.read(size), self._loop)
+        data = future.result()
+        self.size = self.size + len(data)
+        return data
@@ -13,7 +13,7 @@ class CertificatesView(LxdView):
         pass
 
     async def post(self):
-        data = await self.request.json()
+        data = await self.json()
         if not 'type' in data:
             return self.error('Type is mandatory')
 
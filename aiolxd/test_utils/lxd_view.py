@@ -4,11 +4,24 @@ from typing import Dict
 from typing import List
 from typing import Optional
 
+from aiohttp.web import Response
 from aiohttp.web import View
-from aiohttp.web import json_response
 
+from aiolxd.core.codec import get_codec
 from aiolxd.test_utils.common import Certificate
 
+_CODEC = get_codec()
+
+
+def json_response(data: Any, status: int = 200, reason: Optional[str] = None):
+    """Return a JSON response, encoded with the client default codec."""
+    return Response(
+        body=_CODEC.dumps(data),
+        status=status,
+        reason=reason,
+        content_type='application/json'
+    )
+
 
 class LxdView(View):
     """Base class for LXD API mock views."""
@@ -21,6 +34,10 @@ class LxdView(View):
             app['certificates'] = []
         return app['certificates']
 
+    async def json(self) -> Any:
+        """Decode the request JSON body."""
+        return _CODEC.loads(await self.request.read())
+
     @staticmethod
     def response(
         metadata: Optional[Dict[str, Any]] = None,
@@ -56,6 +56,10 @@ setup(
         'aiohttp',
         'pyOpenSSL'
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'ujson': ['ujson'],
+    },
     author="An Otter World",
     author_email="an-otter-world@ki-dour.org",
     url="http://github.com/an-otter-world/aiolxd/",
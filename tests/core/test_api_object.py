@@ -1,4 +1,7 @@
 """ApiObject unit tests."""
+from json import dumps
+
+from aiohttp.web import Response
 from pytest import mark
 
 from aiolxd.core import ApiObject
@@ -27,7 +30,7 @@ async def test_save_properties(lxdclient, api_mock):
         'property_2': ''
     })
 
-    api_mock('put', '/', saved.update)
+    api_mock('patch', '/', saved.update)
 
     async with ApiObject(lxdclient, '/') as obj:
         obj.property_1 = 'Wrote value'
@@ -37,3 +40,100 @@ async def test_save_properties(lxdclient, api_mock):
         'property_1': 'Wrote value',
         'property_2': False
     }
+
+
+@mark.asyncio
+async def test_save_changed_properties(lxdclient, api_mock):
+    """Checks only changed fields and dict keys are patched."""
+    saved = {}
+
+    api_mock('get', '/', {
+        'property_1': '',
+        'config': {'key_1': 'value', 'key_2': 'value'},
+        'devices': {'root': {'path': '/'}}
+    })
+
+    api_mock('patch', '/', saved.update)
+
+    async with ApiObject(lxdclient, '/') as obj:
+        obj.config['key_2'] = 'Wrote value'
+
+    assert saved == {'config': {'key_2': 'Wrote value'}}
+
+
+@mark.asyncio
+async def test_save_removed_properties(lxdclient, api_mock):
+    """Checks the whole object is put when a dict key is removed."""
+    saved = {}
+
+    api_mock('get', '/', {
+        'property_1': '',
+        'config': {'key_1': 'value', 'key_2': 'value'},
+    })
+
+    api_mock('put', '/', saved.update)
+
+    async with ApiObject(lxdclient, '/') as obj:
+        del obj.config['key_2']
+
+    assert saved == {'property_1': '', 'config': {'key_1': 'value'}}
+
+
+@mark.asyncio
+async def test_save_put_method(lxdclient, api_mock):
+    """Checks objects configured to save with PUT send all their fields."""
+    saved = {}
+
+    class _PutObject(ApiObject):
+        readonly_fields = {'property_2'}
+        save_method = 'put'
+
+    api_mock('get', '/', {
+        'property_1': '',
+        'property_2': '',
+        'property_3': ''
+    })
+
+    api_mock('put', '/', saved.update)
+
+    async with _PutObject(lxdclient, '/') as obj:
+        obj.property_1 = 'Wrote value'
+
+    assert saved == {'property_1': 'Wrote value', 'property_3': ''}
+
+
+@mark.asyncio
+async def test_save_unchanged(lxdclient, api_mock):
+    """Checks unchanged objects aren't saved."""
+    api_mock('get', '/', {'property_1': ''})
+
+    async with ApiObject(lxdclient, '/') as obj:
+        obj.property_1 = ''
+
+
+@mark.asyncio
+async def test_etag(lxdclient, api_mock):
+    """Checks ETags are used for conditional reloads and saves."""
+    headers = {}
+    body = dumps({'type': 'sync', 'metadata': {'property_1': ''}})
+
+    def _handler(status, text=None):
+        def _handle(request):
+            headers[request.method] = dict(request.headers)
+            return Response(status=status, text=text, headers={'ETag': 'tag'})
+        return _handle
+
+    api_mock.raw_handler('/', 'get', _handler(200, body))
+    api_mock.raw_handler('/', 'get', _handler(304))
+    api_mock.raw_handler('/', 'patch', _handler(200, body))
+
+    obj = ApiObject(lxdclient, '/')
+    async with obj:
+        assert 'If-None-Match' not in headers['GET']
+
+    async with obj:
+        assert headers['GET']['If-None-Match'] == 'tag'
+        assert obj.property_1 == ''
+        obj.property_1 = 'Wrote value'
+
+    assert headers['PATCH']['If-Match'] == 'tag'
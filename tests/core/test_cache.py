@@ -0,0 +1,109 @@
+"""Response cache unit tests."""
+from time import sleep
+
+from aiohttp.web import Response
+from pytest import fixture
+from pytest import mark
+
+from aiolxd import Client
+from aiolxd.core import ResponseCache
+
+
+@fixture
+@mark.asyncio
+async def cached_client(api_mock):  # pylint: disable=unused-argument
+    """Return a client caching GET responses."""
+    async with Client('http://lxd', cache=ResponseCache(ttl=60)) as client:
+        yield client
+
+
+def test_cache_hit_miss():
+    """Checks hits and misses are counted."""
+    cache = ResponseCache()
+    assert cache.get('/1.0') is None
+    cache.put('/1.0', 200, {}, b'{}')
+    assert cache.get('/1.0') == (200, {}, b'{}')
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_ttl():
+    """Checks responses expire after ttl."""
+    cache = ResponseCache(ttl=0.01)
+    cache.put('/1.0', 200, {}, b'{}')
+    sleep(0.02)
+    assert cache.get('/1.0') is None
+    assert len(cache) == 0
+
+
+def test_cache_lru():
+    """Checks least recently used responses are evicted first."""
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put('/1', 200, {}, b'111')
+    cache.put('/2', 200, {}, b'222')
+    cache.get('/1')
+    cache.put('/3', 200, {}, b'333')
+    assert cache.get('/2') is None
+    assert cache.get('/1') is not None
+
+    cache.put('/4', 200, {}, b'4444')
+    assert cache.get('/3') is None
+    assert len(cache) == 2
+    assert cache.size == 7
+
+
+def test_cache_uncacheable():
+    """Checks errors, operations and events are never cached."""
+    cache = ResponseCache()
+    cache.put('/1.0', 404, {}, b'{}')
+    cache.put('/1.0/operations/id/wait', 200, {}, b'{}')
+    cache.put('/1.0/events', 200, {}, b'{}')
+    assert len(cache) == 0
+
+
+def test_cache_invalidate():
+    """Checks an url and its parents are invalidated, whatever the query."""
+    cache = ResponseCache()
+    for url in [
+        '/1.0/containers',
+        '/1.0/containers?recursion=1',
+        '/1.0/containers/web1',
+        '/1.0/containers/web2',
+    ]:
+        cache.put(url, 200, {}, b'{}')
+
+    cache.invalidate('/1.0/containers/web1/state')
+    assert len(cache) == 1
+    assert cache.get('/1.0/containers/web2') is not None
+
+
+@mark.asyncio
+async def test_client_cache(cached_client, api_mock):
+    """Checks the client caches GETs and invalidates them on writes."""
+    api_mock('get', '/1.0/containers/web1', {'status': 'Stopped'})
+    api_mock('put', '/1.0/containers/web1/state', {})
+    api_mock('get', '/1.0/containers/web1', {'status': 'Running'})
+
+    for _ in range(2):
+        result = await cached_client.query('get', '/1.0/containers/web1')
+        assert result['metadata'] == {'status': 'Stopped'}
+
+    result['metadata']['status'] = 'Modified'
+    result = await cached_client.query('get', '/1.0/containers/web1')
+    assert result['metadata'] == {'status': 'Stopped'}
+
+    await cached_client.query('put', '/1.0/containers/web1/state', {})
+    result = await cached_client.query('get', '/1.0/containers/web1')
+    assert result['metadata'] == {'status': 'Running'}
+    assert cached_client.cache.hits == 2
+
+
+@mark.asyncio
+async def test_client_cache_head(cached_client, api_mock):
+    """Checks HEAD requests are never answered from cached GETs."""
+    api_mock('get', '/1.0/containers/web1', {'status': 'Running'})
+    api_mock.raw_handler('/1.0/containers/web1', 'head', Response())
+
+    await cached_client.query('get', '/1.0/containers/web1')
+    response = await cached_client.request('head', '/1.0/containers/web1')
+    assert response.data is None
+    assert cached_client.cache.hits == 0
@@ -0,0 +1,169 @@
+"""Client unit tests."""
+from asyncio import gather
+from asyncio import sleep
+from pathlib import Path
+from ssl import PROTOCOL_TLS_SERVER
+from ssl import SSLContext
+from time import perf_counter
+from typing import AsyncIterator
+from typing import Tuple
+
+from aiohttp.web import AppRunner
+from aiohttp.web import Application
+from aiohttp.web import BaseRequest
+from aiohttp.web import StreamResponse
+from aiohttp.web import TCPSite
+from aiohttp.web import UnixSite
+from aiohttp.web import WebSocketResponse
+from aiohttp.web import json_response
+from pytest import fixture
+from pytest import mark
+
+from aiolxd import Client
+from aiolxd.core import ApiObject
+
+_BENCH_QUERIES = 200
+
+
+@fixture
+@mark.asyncio
+async def lxd_server(datadir: Path, tmp_path: Path) -> AsyncIterator[
+    Tuple[Path, int]
+]:
+    """Run a stand-in LXD server on both an unix socket and TCP + TLS.
+
+    Yields the unix socket path and the TCP port.
+    """
+    async def _api(_: BaseRequest) -> StreamResponse:
+        return json_response({'type': 'sync', 'metadata': {'api': '1.0'}})
+
+    async def _websocket(request: BaseRequest) -> StreamResponse:
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        await socket.send_bytes(request.query['secret'].encode('utf-8'))
+        await socket.close()
+        return socket
+
+    app = Application()
+    app.router.add_get('/1.0', _api)
+    app.router.add_get('/1.0/operations/{id}/websocket', _websocket)
+
+    ssl_context = SSLContext(PROTOCOL_TLS_SERVER)
+    ssl_context.load_cert_chain(datadir / 'dummy.crt', datadir / 'dummy.key')
+
+    socket_path = tmp_path / 'unix.socket'
+    runner = AppRunner(app)
+    await runner.setup()
+    unix_site = UnixSite(runner, str(socket_path))
+    tcp_site = TCPSite(runner, '127.0.0.1', 0, ssl_context=ssl_context)
+    await unix_site.start()
+    await tcp_site.start()
+    # pylint: disable=protected-access
+    port = tcp_site._server.sockets[0].getsockname()[1]
+
+    yield (socket_path, port)
+
+    await runner.cleanup()
+
+
+@mark.asyncio
+async def test_unix_socket_query(lxd_server):
+    """Checks the client can query LXD through an unix socket."""
+    (socket_path, _) = lxd_server
+    async with Client('unix://%s' % socket_path) as client:
+        result = await client.query('get', '/1.0')
+        assert result['metadata'] == {'api': '1.0'}
+
+
+@mark.asyncio
+async def test_unix_socket_websocket(lxd_server):
+    """Checks operation websockets are reachable through an unix socket."""
+    (socket_path, _) = lxd_server
+    async with Client('unix://%s' % socket_path) as client:
+        socket = await client.connect_websocket('operation', 'secret')
+        message = await socket.receive()
+        assert message.data == b'secret'
+        await socket.close()
+
+
+@mark.bench
+@mark.asyncio
+async def test_unix_socket_throughput(lxd_server):
+    """Checks the unix socket serves more sequential queries than TCP + TLS."""
+    (socket_path, port) = lxd_server
+
+    async def _bench(client: Client) -> float:
+        start = perf_counter()
+        for _ in range(_BENCH_QUERIES):
+            await client.query('get', '/1.0')
+        return _BENCH_QUERIES / (perf_counter() - start)
+
+    async with Client('unix://%s' % socket_path) as client:
+        unix_rate = await _bench(client)
+
+    async with Client(
+        'https://127.0.0.1:%d' % port,
+        verify_host_certificate=False
+    ) as client:
+        tcp_rate = await _bench(client)
+
+    assert unix_rate > tcp_rate, (
+        'unix socket: %.0f queries/s, tcp + tls: %.0f queries/s' %
+        (unix_rate, tcp_rate)
+    )
+
+
+@mark.asyncio
+async def test_coalesce_identical_gets(lxdclient, api_mock):
+    """Checks concurrent identical GETs are sent once, with separate data."""
+    requests = []
+
+    async def _handler(_):
+        requests.append(None)
+        await sleep(0.01)
+        return {'config': {'key': 'value'}}
+
+    api_mock('get', '/1.0/containers/web1', _handler)
+
+    async def _load(value):
+        async with ApiObject(lxdclient, '/1.0/containers/web1') as obj:
+            obj.config['key'] = value
+            await sleep(0.01)
+            return obj.config['key']
+
+    values = ['value_1', 'value_2', 'value_3']
+    for _ in values:
+        api_mock('patch', '/1.0/containers/web1', {})
+    assert await gather(*[_load(it) for it in values]) == values
+    assert len(requests) == 1
+
+    api_mock('get', '/1.0/containers/web1', _handler)
+    results = await gather(*[
+        lxdclient.query('get', '/1.0/containers/web1') for _ in range(2)
+    ])
+    results[0]['metadata']['config']['key'] = 'modified'
+    assert results[1]['metadata']['config']['key'] == 'value'
+    assert len(requests) == 2
+
+
+@mark.asyncio
+async def test_pool_stats(lxd_server):
+    """Checks pool settings are applied and pool metrics are reported."""
+    (socket_path, _) = lxd_server
+    async with Client(
+        'unix://%s' % socket_path,
+        pool_size=1,
+        keepalive_timeout=30
+    ) as client:
+        await gather(*[
+            client.query('get', '/1.0?request=%d' % it) for it in range(3)
+        ])
+
+        stats = client.pool_stats
+        assert stats.limit == 1
+        assert stats.created == 1
+        assert stats.reused == 2
+        assert stats.queued == 2
+        assert (stats.in_use, stats.idle, stats.waiters) == (0, 1, 0)
+        assert stats.max_acquire_time <= stats.acquire_time
+        assert stats.mean_acquire_time > 0
@@ -0,0 +1,69 @@
+"""JSON codecs unit tests."""
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import importorskip
+from pytest import mark
+from pytest import raises
+
+from aiolxd import Client
+from aiolxd.core import get_codec
+from aiolxd.core.codec import StdlibCodec
+
+
+@mark.parametrize('name', ['json', 'orjson', 'ujson'])
+def test_codec_round_trip(name):
+    """Check codecs encode to bytes and decode from bytes and str."""
+    if name != 'json':
+        importorskip(name)
+    codec = get_codec(name)
+    data = {'name': 'web1', 'config': {'limits.cpu': 2}, 'text': 'é'}
+    encoded = codec.dumps(data)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == data
+    assert codec.loads(encoded.decode('utf-8')) == data
+
+
+def test_default_codec():
+    """Check the fastest installed codec is used by default."""
+    try:
+        import orjson  # pylint: disable=import-outside-toplevel,unused-import
+        assert get_codec().name == 'orjson'
+    except ImportError:
+        assert get_codec().name in ['ujson', 'json']
+    with raises(ValueError):
+        get_codec('unknown')
+
+
+@mark.parametrize('lxdclient', [{'codec': StdlibCodec()}], indirect=True)
+@mark.asyncio
+async def test_client_codec(lxdclient, api_mock):
+    """Check the client encodes and decodes bodies with its codec."""
+    received = {}
+    api_mock('put', '/1.0/containers/web1', received.update)
+    await lxdclient.query('put', '/1.0/containers/web1', {'key': 'é'})
+    assert received == {'key': 'é'}
+    assert lxdclient.codec.name == 'json'
+
+
+@mark.asyncio
+async def test_client_offload(api_mock):
+    """Check big bodies are decoded in the executor, small ones inline."""
+    api_mock('get', '/1.0/containers', ['/1.0/containers/web%d' % it
+                                        for it in range(100)])
+    api_mock('get', '/1.0', {})
+
+    with ThreadPoolExecutor(1) as executor:
+        async with Client(
+            'http://lxd',
+            offload_threshold=1000,
+            executor=executor
+        ) as client:
+            result = await client.query('get', '/1.0/containers')
+            assert len(result['metadata']) == 100
+            await client.query('get', '/1.0')
+
+            stats = client.codec_stats
+            assert stats.offloaded == 1
+            assert stats.offloaded_bytes > 1000
+            assert stats.inline == 1
+            assert stats.max_blocked_time <= stats.blocked_time
@@ -1,8 +1,16 @@
 """Collection unit tests."""
+from asyncio import sleep
+from asyncio import wait_for
+from json import dumps
+
+from aiohttp.web import Response
 from pytest import mark
 from pytest import raises
 
 from aiolxd.core import Collection
+from aiolxd.core import DeleteError
+from aiolxd.core import OperationError
+from aiolxd.core import PriorityScheduler
 
 
 @mark.asyncio
@@ -22,6 +30,77 @@ async def test_collection_delete(lxdclient, api_mock):
     assert deleted['value']
 
 
+@mark.asyncio
+async def test_collection_delete_concurrency(lxdclient, api_mock):
+    """Checks deletions are run concurrently, up to the configured limit."""
+    deleting = {'current': 0, 'max': 0}
+    names = ['object_%d' % it for it in range(5)]
+    api_mock('get', '/', ['/%s' % it for it in names])
+
+    async def _handler(_):
+        deleting['current'] = deleting['current'] + 1
+        deleting['max'] = max(deleting['max'], deleting['current'])
+        await sleep(0.01)
+        deleting['current'] = deleting['current'] - 1
+        return {}
+
+    for name in names:
+        api_mock('delete', '/%s' % name, _handler)
+
+    async with Collection(lxdclient, '', delete_concurrency=2) as collection:
+        for name in names:
+            del collection[name]
+
+    assert deleting['max'] == 2
+
+
+@mark.asyncio
+async def test_collection_delete_error(lxdclient, api_mock):
+    """Checks failed deletions are reported, and other ones still applied."""
+    _mock_collection_endpoint(api_mock)
+    deleted = []
+
+    def _handler(_):
+        deleted.append('object_1')
+        return {}
+
+    api_mock('delete', '/object_1', _handler)
+    api_mock.raw_handler('/object_2', 'delete', Response(status=500))
+
+    collection = Collection(lxdclient, '')
+    with raises(DeleteError) as error:
+        async with collection:
+            del collection['object_1']
+            del collection['object_2']
+
+    assert deleted == ['object_1']
+    assert list(error.value.failures) == ['/object_2']
+    assert 'object_1' not in collection
+    assert 'object_2' in collection
+
+
+@mark.asyncio
+async def test_collection_delete_operation_failure(lxdclient, api_mock):
+    """Checks background deletions ending with a failure are reported."""
+    _mock_collection_endpoint(api_mock)
+    api_mock('delete', '/object_1', {'id': 'operation'}, sync=False)
+    api_mock('get', '/1.0/operations/operation/wait', {
+        'status': 'Failure',
+        'status_code': 400,
+        'err': 'Container is running'
+    })
+
+    collection = Collection(lxdclient, '')
+    with raises(DeleteError) as error:
+        async with collection:
+            del collection['object_1']
+
+    failure = error.value.failures['/object_1']
+    assert isinstance(failure, OperationError)
+    assert failure.operation['err'] == 'Container is running'
+    assert 'object_1' in collection
+
+
 @mark.asyncio
 async def test_collection_get_item(lxdclient, api_mock):
     """Checks accessing a collection children works."""
@@ -50,6 +129,65 @@ async def test_collection_iterate(lxdclient, api_mock):
         assert names[1] == 'object_2'
 
 
+@mark.asyncio
+async def test_collection_iter_concurrency(lxdclient, api_mock):
+    """Checks iter loads children concurrently, in the collection order."""
+    loading = {'current': 0, 'max': 0}
+    names = ['object_%d' % it for it in range(6)]
+    api_mock('get', '/', ['/%s' % it for it in names])
+
+    def _mock_child(name, delay):
+        async def _handler(_):
+            loading['current'] = loading['current'] + 1
+            loading['max'] = max(loading['max'], loading['current'])
+            await sleep(delay)
+            loading['current'] = loading['current'] - 1
+            return {'name': name}
+        api_mock('get', '/%s' % name, _handler)
+
+    for (index, name) in enumerate(names):
+        _mock_child(name, 0.01 * (len(names) - index))
+
+    async with Collection(lxdclient, '') as collection:
+        loaded = [it.name async for it in collection.iter(concurrency=3)]
+
+    assert loaded == names
+    assert loading['max'] == 3
+
+
+@mark.asyncio
+async def test_collection_iter_unordered(lxdclient, api_mock):
+    """Checks unordered iteration yields children as they are loaded."""
+    api_mock('get', '/', ['/slow', '/fast'])
+
+    async def _slow(_):
+        await sleep(0.05)
+        return {'name': 'slow'}
+
+    api_mock('get', '/slow', _slow)
+    api_mock('get', '/fast', {'name': 'fast'})
+
+    async with Collection(lxdclient, '') as collection:
+        iterator = collection.iter(concurrency=2, ordered=False)
+        loaded = [it.name async for it in iterator]
+
+    assert loaded == ['fast', 'slow']
+
+
+@mark.asyncio
+async def test_collection_iter_break(lxdclient, api_mock):
+    """Checks breaking out of iter doesn't save the current child."""
+    _mock_collection_endpoint(api_mock)
+
+    async with Collection(lxdclient, '') as collection:
+        iterator = collection.iter(concurrency=2)
+        async for child in iterator:
+            # No put is mocked, so saving would fail.
+            child.name = 'modified'
+            break
+        await iterator.aclose()
+
+
 @mark.asyncio
 async def test_collection_len(lxdclient, api_mock):
     """Checks len operator works on collections."""
@@ -71,6 +209,68 @@ async def test_index_error(lxdclient, api_mock):
             del collection['bad_item']
 
 
+@mark.asyncio
+async def test_collection_recursion(lxdclient, api_mock):
+    """Checks children are built from a recursive listing without GETs."""
+    api_mock.raw_handler('/?recursion=1', 'get', dumps({
+        'type': 'sync',
+        'metadata': [{'name': 'object_1'}, {'name': 'object_2'}]
+    }), match_querystring=True)
+
+    async with Collection(lxdclient, '', recursion=1) as collection:
+        assert len(collection) == 2
+        assert 'object_1' in collection
+        names = [it.name async for it in collection]
+        assert names == ['object_1', 'object_2']
+
+
+@mark.asyncio
+async def test_collection_recursion_reload(lxdclient, api_mock):
+    """Checks preloaded child data is only used once."""
+    api_mock('get', '/', [{'name': 'object_1', 'value': 'preloaded'}])
+    api_mock('get', '/object_1', {'name': 'object_1', 'value': 'loaded'})
+
+    async with Collection(lxdclient, '', recursion=1) as collection:
+        async with collection['object_1'] as child:
+            assert child.value == 'preloaded'
+
+        async with collection['object_1'] as child:
+            assert child.value == 'loaded'
+
+
+@mark.asyncio
+async def test_collection_stream(lxdclient, api_mock):
+    """Checks children are yielded while a recursive listing is parsed."""
+    children = [
+        {'name': 'object_%d' % it, 'config': {'key': '"]}, %d' % it}}
+        for it in range(20)
+    ]
+    api_mock.raw_handler('/?recursion=1', 'get', dumps({
+        'type': 'sync',
+        'metadata': children
+    }), match_querystring=True)
+
+    collection = Collection(lxdclient, '', recursion=1)
+    streamed = [it.config async for it in collection.stream(chunk_size=7)]
+    assert streamed == [it['config'] for it in children]
+
+
+@mark.parametrize('lxdclient', [{
+    'scheduler': PriorityScheduler(concurrency=1),
+    'pool_size_per_host': 1,
+}], indirect=True)
+@mark.asyncio
+async def test_collection_stream_requests(lxdclient, api_mock):
+    """Checks streamed children can send requests with a single slot."""
+    _mock_collection_endpoint(api_mock)
+
+    async def _stream():
+        collection = Collection(lxdclient, '')
+        return [it.name async for it in collection.stream(spool_size=4)]
+
+    assert await wait_for(_stream(), 1) == ['object_1', 'object_2']
+
+
 def _mock_collection_endpoint(api_mock) -> None:
     api_mock('get', '/', ['/object_1', '/object_2'])
     api_mock('get', '/object_1', {'name': 'object_1'})
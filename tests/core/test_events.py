@@ -0,0 +1,125 @@
+"""LXD events stream unit tests."""
+from asyncio import Future
+from asyncio import ensure_future
+from asyncio import sleep
+from asyncio import wait_for
+from typing import Any
+from typing import Dict
+from typing import List
+
+from aiohttp.web import BaseRequest
+from aiohttp.web import WebSocketResponse
+from pytest import mark
+
+from aiolxd import Client
+from aiolxd.core.events import DROP_NEWEST
+from aiolxd.core.events import DROP_OLDEST
+
+from tests.helpers import ApiMock
+
+
+@mark.asyncio
+async def test_events_fan_out(lxdclient, api_mock):
+    """Checks events are dispatched to every matching subscriber."""
+    closed = _mock_events(api_mock, [
+        _event('logging', 1),
+        _event('operation', 2),
+        _event('lifecycle', 3),
+    ])
+
+    all_events = lxdclient.events()
+    operations = lxdclient.events(types=['operation'])
+
+    async with all_events, operations:
+        assert [await _next_id(all_events) for _ in range(3)] == [1, 2, 3]
+        assert await _next_id(operations) == 2
+
+    closed.set_result(None)
+
+
+@mark.asyncio
+async def test_events_reconnect(lxdclient, api_mock):
+    """Checks the stream reconnects when the websocket is closed."""
+    _mock_events(api_mock, [_event('lifecycle', 1)], keep_open=False)
+    closed = _mock_events(api_mock, [_event('lifecycle', 2)])
+
+    async with lxdclient.events() as events:
+        assert await _next_id(events) == 1
+        assert await _next_id(events) == 2
+
+    closed.set_result(None)
+
+
+@mark.asyncio
+@mark.parametrize('policy,expected', [
+    (DROP_OLDEST, 3),
+    (DROP_NEWEST, 1),
+])
+async def test_events_overflow(lxdclient, api_mock, policy, expected):
+    """Checks full subscriber queues drop events according to the policy."""
+    closed = _mock_events(api_mock, [
+        _event('lifecycle', 1),
+        _event('lifecycle', 2),
+        _event('lifecycle', 3),
+    ])
+
+    async with lxdclient.events(queue_size=1, policy=policy) as events:
+        while events.dropped < 2:
+            await sleep(0.01)
+        assert await _next_id(events) == expected
+
+    closed.set_result(None)
+
+
+@mark.asyncio
+async def test_events_client_close(api_mock):
+    """Checks closing the client ends the iteration of subscriptions."""
+    _mock_events(api_mock, [_event('lifecycle', 1)])
+    received = []
+
+    async def _consume(events):
+        async for event in events:
+            received.append(event['metadata']['id'])
+
+    async with Client('http://lxd') as client:
+        consumer = ensure_future(_consume(client.events()))
+        while not received:
+            await sleep(0.01)
+
+    await wait_for(consumer, 1)
+    assert received == [1]
+
+
+def _event(event_type: str, event_id: int) -> Dict[str, Any]:
+    return {
+        'type': event_type,
+        'timestamp': '2020-01-01T00:00:00Z',
+        'metadata': {'id': event_id}
+    }
+
+
+async def _next_id(events: Any) -> int:
+    event = await events.__anext__()
+    return event['metadata']['id']
+
+
+def _mock_events(
+    api_mock: ApiMock,
+    events: List[Dict[str, Any]],
+    keep_open: bool = True
+) -> 'Future[None]':
+    closed: 'Future[None]' = Future()
+    if not keep_open:
+        closed.set_result(None)
+
+    async def _handler(request: BaseRequest) -> WebSocketResponse:
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        for event in events:
+            await socket.send_json(event)
+        await closed
+        await socket.close()
+        return socket
+
+    api_mock.raw_handler('/1.0/events', 'get', _handler)
+    return closed
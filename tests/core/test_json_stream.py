@@ -0,0 +1,40 @@
+"""Incremental JSON array parser unit tests."""
+from json import dumps
+from json import loads
+
+from aiolxd.core.json_stream import JsonArrayParser
+
+
+def _parse(body, chunk_size):
+    parser = JsonArrayParser('metadata')
+    items = []
+    for offset in range(0, len(body), chunk_size):
+        items.extend(parser.feed(body[offset:offset + chunk_size]))
+    return [loads(it) for it in items]
+
+
+def test_parser_chunk_boundaries():
+    """Checks items are extracted whatever the chunk boundaries."""
+    metadata = [
+        {'name': 'web\\\\"1', 'list': [1, {'a': None}]},
+        '/1.0/containers/web2,]',
+        12,
+        None,
+        [[], {}],
+    ]
+    body = dumps({'type': 'sync', 'metadata': metadata}).encode('utf-8')
+    for chunk_size in [1, 2, 3, 7, len(body)]:
+        assert _parse(body, chunk_size) == metadata
+
+
+def test_parser_key_lookup():
+    """Checks only the array under the top-level key is extracted."""
+    body = dumps({
+        'operation': {'metadata': [1]},
+        'error': 'metadata',
+        'metadata': [2, 3],
+    }).encode('utf-8')
+    assert _parse(body, 4) == [2, 3]
+
+    body = dumps({'metadata': {'name': 'web1'}}).encode('utf-8')
+    assert _parse(body, 4) == []
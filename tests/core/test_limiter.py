@@ -0,0 +1,124 @@
+"""Adaptive concurrency limiter unit tests."""
+from asyncio import ensure_future
+from asyncio import gather
+from asyncio import sleep
+from asyncio import wait_for
+
+from aiohttp import ClientResponseError
+from aiohttp.web import Response
+from pytest import mark
+from pytest import raises
+
+from aiolxd import Client
+from aiolxd.core.limiter import AdaptiveLimiter
+from aiolxd.core.limiter import AimdLimit
+from aiolxd.core.scheduler import BULK
+from aiolxd.core.scheduler import INTERACTIVE
+
+
+@mark.asyncio
+async def test_aimd_limit():
+    """Checks the limit grows on success, and shrinks on failures."""
+    limit = AimdLimit(initial=2, latency_target=10)
+    await limit.acquire()
+    await limit.acquire()
+    waiter = ensure_future(limit.acquire())
+    await sleep(0)
+    assert not waiter.done()
+    assert limit.waiting == 1
+
+    limit.release(0.01)
+    await waiter
+    assert limit.limit == 2.5
+    assert limit.in_flight == 2
+
+    limit.release(failed=True)
+    assert limit.limit == 1.25
+    limit.release(20)
+    assert limit.limit == 1.25
+    assert limit.decreases == 1
+    assert limit.in_flight == 0
+
+
+@mark.asyncio
+async def test_aimd_limit_priority():
+    """Checks waiting requests are served by priority."""
+    limit = AimdLimit(initial=1, aging=10)
+    await limit.acquire()
+    served = []
+
+    async def _acquire(name, priority):
+        await limit.acquire(priority)
+        served.append(name)
+        limit.release()
+
+    waiters = gather(
+        _acquire('bulk', BULK),
+        _acquire('interactive', INTERACTIVE)
+    )
+    await sleep(0)
+    assert limit.waiting == 2
+
+    limit.release()
+    await waiters
+    assert served == ['interactive', 'bulk']
+
+
+@mark.asyncio
+async def test_client_limiter(api_mock):
+    """Checks requests in flight are limited, except operation waits."""
+    running = {'current': 0, 'max': 0}
+
+    async def _handler(_):
+        running['current'] = running['current'] + 1
+        running['max'] = max(running['max'], running['current'])
+        await sleep(0.01)
+        running['current'] = running['current'] - 1
+        return {}
+
+    for index in range(3):
+        api_mock('get', '/1.0/containers/web%d' % index, _handler)
+    api_mock.raw_handler(
+        '/1.0/containers/error',
+        'get',
+        Response(status=500, text='error')
+    )
+
+    limiter = AdaptiveLimiter(read=AimdLimit(initial=1, max_limit=1))
+    async with Client('http://lxd', limiter=limiter) as client:
+        await gather(*[
+            client.query('get', '/1.0/containers/web%d' % it)
+            for it in range(3)
+        ])
+        assert running['max'] == 1
+
+        with raises(ClientResponseError):
+            await client.query('get', '/1.0/containers/error')
+        assert limiter.read.decreases == 1
+        assert limiter.read.in_flight == 0
+
+        assert limiter.budget('get', '/1.0/operations/id/wait') is None
+        assert limiter.budget('post', '/1.0/containers') is limiter.write
+        assert 'aiolxd_limiter_limit{budget="read"}' in limiter.prometheus()
+
+
+@mark.asyncio
+async def test_client_limiter_download(api_mock):
+    """Checks downloads release their slot once headers are received."""
+    api_mock.raw_handler('/1.0/containers/web/logs/log', 'get', 'x' * 10)
+    api_mock('get', '/1.0/containers/web', {})
+
+    limiter = AdaptiveLimiter(
+        read=AimdLimit(initial=1, max_limit=1, latency_target=0.05)
+    )
+    async with Client('http://lxd', limiter=limiter) as client:
+        chunks = client.download('/1.0/containers/web/logs/log', 1)
+        assert await chunks.__anext__() == b'x'
+        await wait_for(client.query('get', '/1.0/containers/web'), 1)
+
+        # A slow consumer isn't a slow daemon.
+        await sleep(0.1)
+        assert b''.join([it async for it in chunks]) == b'x' * 9
+
+    assert limiter.read.decreases == 0
+    assert limiter.read.in_flight == 0
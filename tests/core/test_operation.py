@@ -0,0 +1,98 @@
+"""Operation unit tests."""
+from asyncio import Future
+from asyncio import gather
+from typing import Any
+from typing import Dict
+
+from aiohttp.web import BaseRequest
+from aiohttp.web import WebSocketResponse
+from pytest import mark
+
+from aiolxd.core.operation import Operation
+
+
+@mark.parametrize('lxdclient', [{'operation_events': True}], indirect=True)
+@mark.asyncio
+async def test_operation_wait_events(lxdclient, api_mock):
+    """Checks operations are resolved from operation events."""
+    submitted: 'Future[None]' = Future()
+
+    def _submit(_: Any) -> Dict[str, Any]:
+        submitted.set_result(None)
+        return {'id': 'operation_id'}
+
+    async def _events(request: BaseRequest) -> WebSocketResponse:
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        await submitted
+        for status_code in [103, 200]:
+            await socket.send_json({
+                'type': 'operation',
+                'metadata': {'id': 'operation_id', 'status_code': status_code}
+            })
+        await socket.receive()
+        return socket
+
+    api_mock.raw_handler('/1.0/events', 'get', _events)
+    api_mock('post', '/1.0/containers', _submit, False)
+
+    result = await Operation(lxdclient, 'post', '/1.0/containers', {})
+    assert result == {'id': 'operation_id', 'status_code': 200}
+
+
+@mark.parametrize('lxdclient', [{'operation_events': True}], indirect=True)
+@mark.asyncio
+async def test_operation_wait_events_burst(lxdclient, api_mock):
+    """Checks concurrent operations are all resolved from the websocket."""
+    count = 20
+    submitted = []
+    all_submitted: 'Future[None]' = Future()
+    waited = []
+
+    def _submit(_: Any) -> Dict[str, Any]:
+        submitted.append('operation_%d' % len(submitted))
+        if len(submitted) == count:
+            all_submitted.set_result(None)
+        return {'id': submitted[-1]}
+
+    def _wait(_: Any) -> Dict[str, Any]:
+        waited.append(None)
+        return {'status_code': 200}
+
+    async def _events(request: BaseRequest) -> WebSocketResponse:
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        await all_submitted
+        for operation_id in submitted:
+            await socket.send_json({
+                'type': 'operation',
+                'metadata': {'id': operation_id, 'status_code': 200}
+            })
+        await socket.receive()
+        return socket
+
+    api_mock.raw_handler('/1.0/events', 'get', _events)
+    for index in range(count):
+        api_mock('post', '/1.0/containers', _submit, False)
+        api_mock('get', '/1.0/operations/operation_%d/wait' % index, _wait)
+
+    await gather(*[
+        Operation(lxdclient, 'post', '/1.0/containers', {})
+        for _ in range(count)
+    ])
+    assert len(submitted) == count
+    assert not waited
+
+
+@mark.parametrize('lxdclient', [{'operation_events': True}], indirect=True)
+@mark.asyncio
+async def test_operation_wait_fallback(lxdclient, api_mock):
+    """Checks operations are waited with /wait if events are unavailable."""
+    api_mock('post', '/1.0/containers', {'id': 'operation_id'}, False)
+    api_mock('get', '/1.0/operations/operation_id/wait', {
+        'id': 'operation_id',
+        'status_code': 200
+    })
+
+    result = await Operation(lxdclient, 'post', '/1.0/containers', {})
+    assert result == {'id': 'operation_id', 'status_code': 200}
@@ -0,0 +1,55 @@
+"""Retry policy unit tests."""
+from aiohttp import ClientResponseError
+from aiohttp import ServerDisconnectedError
+from aiohttp.web import Response
+from pytest import mark
+from pytest import raises
+
+from aiolxd.core import RetryPolicy
+
+
+def _mock_error(api_mock, method, url, status=503):
+    api_mock.raw_handler(url, method, Response(status=status, text='busy'))
+
+
+def test_retry_delay():
+    """Checks delays grow exponentially, with jitter, up to max_delay."""
+    policy = RetryPolicy(attempts=10, base_delay=1, max_delay=3, budget=10)
+    error = ServerDisconnectedError()
+    delays = [policy.get_delay(it, error) for it in range(1, 5)]
+    assert 0 <= delays[0] <= 1
+    assert 0 <= delays[1] <= 2
+    assert all(0 <= it <= 3 for it in delays[2:])
+    assert policy.reasons == {'ServerDisconnectedError': 4}
+
+    not_found = ClientResponseError(None, (), status=404)
+    assert policy.get_delay(1, not_found) is None
+
+
+@mark.parametrize('lxdclient', [{
+    'retry': RetryPolicy(attempts=3, base_delay=0, budget=2)
+}], indirect=True)
+@mark.asyncio
+async def test_client_retry(lxdclient, api_mock):
+    """Checks idempotent requests are retried, within attempts and budget."""
+    _mock_error(api_mock, 'get', '/1.0/operations/id/wait')
+    _mock_error(api_mock, 'get', '/1.0/operations/id/wait')
+    api_mock('get', '/1.0/operations/id/wait', {'status': 'Success'})
+    result = await lxdclient.query('get', '/1.0/operations/id/wait')
+    assert result['metadata'] == {'status': 'Success'}
+
+    policy = lxdclient.retry
+    assert policy.retries == 2
+    assert policy.reasons == {'503': 2}
+
+    _mock_error(api_mock, 'get', '/1.0')
+    _mock_error(api_mock, 'get', '/1.0')
+    with raises(ClientResponseError):
+        await lxdclient.query('get', '/1.0')
+    assert policy.budget_exhausted == 1
+    assert 'aiolxd_retries_total{reason="503"} 2' in policy.prometheus()
+
+    _mock_error(api_mock, 'post', '/1.0/containers')
+    with raises(ClientResponseError):
+        await lxdclient.query('post', '/1.0/containers', {})
+    assert policy.retries == 2
@@ -0,0 +1,114 @@
+"""Priority scheduler unit tests."""
+from asyncio import Event
+from asyncio import ensure_future
+from asyncio import gather
+from asyncio import sleep
+
+from pytest import mark
+
+from aiolxd import Client
+from aiolxd.core import ApiObject
+from aiolxd.core.scheduler import BULK
+from aiolxd.core.scheduler import INTERACTIVE
+from aiolxd.core.scheduler import NORMAL
+from aiolxd.core.scheduler import PriorityScheduler
+
+
+async def _run_in_order(scheduler, priorities):
+    """Queue requests of the given priorities, returning the serving order."""
+    served = []
+    release = Event()
+
+    async def _hold():
+        async with scheduler.slot('/1.0'):
+            await release.wait()
+
+    async def _request(index, priority):
+        async with scheduler.slot('/1.0', priority):
+            served.append(index)
+
+    holder = ensure_future(_hold())
+    await sleep(0)
+    requests = []
+    for (index, priority) in enumerate(priorities):
+        requests.append(ensure_future(_request(index, priority)))
+        await sleep(0.01)
+
+    assert scheduler.waiting == len(priorities)
+    release.set()
+    await gather(holder, *requests)
+    return served
+
+
+@mark.asyncio
+async def test_scheduler_priority():
+    """Checks urgent requests are served before bulk ones queued earlier."""
+    scheduler = PriorityScheduler(concurrency=1, aging=10)
+    served = await _run_in_order(scheduler, [BULK, BULK, INTERACTIVE])
+    assert served == [2, 0, 1]
+    assert scheduler.served == {NORMAL: 1, BULK: 2, INTERACTIVE: 1}
+    assert scheduler.in_flight == 0
+
+
+@mark.asyncio
+async def test_scheduler_aging():
+    """Checks requests waiting long enough are served first anyway."""
+    scheduler = PriorityScheduler(concurrency=1, aging=0.001)
+    served = await _run_in_order(scheduler, [BULK, INTERACTIVE])
+    assert served == [0, 1]
+
+
+@mark.asyncio
+async def test_scheduler_cancelled():
+    """Checks cancelled requests leave the queue right away."""
+    scheduler = PriorityScheduler(concurrency=1)
+
+    async def _request():
+        async with scheduler.slot('/1.0'):
+            await sleep(60)
+
+    holder = ensure_future(_request())
+    await sleep(0)
+    waiter = ensure_future(_request())
+    await sleep(0)
+    assert scheduler.waiting == 1
+
+    waiter.cancel()
+    await gather(waiter, return_exceptions=True)
+    assert scheduler.waiting == 0
+
+    holder.cancel()
+    await gather(holder, return_exceptions=True)
+    assert scheduler.in_flight == 0
+
+
+@mark.asyncio
+async def test_client_scheduler(api_mock):
+    """Checks endpoint priorities are used to schedule client requests."""
+    served = []
+
+    def _handler(name):
+        async def _serve(_):
+            served.append(name)
+            await sleep(0.01)
+            return {}
+        return _serve
+
+    for name in ['bulk_1', 'bulk_2', 'interactive']:
+        api_mock('get', '/1.0/containers/%s' % name, _handler(name))
+
+    scheduler = PriorityScheduler(concurrency=1, aging=10)
+    async with Client('http://lxd', scheduler=scheduler) as client:
+        async def _load(name, priority):
+            child = ApiObject(client, '/1.0/containers/%s' % name)
+            child.priority = priority
+            async with child:
+                pass
+
+        await gather(
+            _load('bulk_1', BULK),
+            _load('bulk_2', BULK),
+            _load('interactive', INTERACTIVE)
+        )
+
+    assert served == ['bulk_1', 'interactive', 'bulk_2']
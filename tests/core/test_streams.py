@@ -0,0 +1,99 @@
+"""Websocket stream wrappers unit tests."""
+from asyncio import IncompleteReadError
+from asyncio import ensure_future
+from asyncio import sleep
+
+from pytest import mark
+from pytest import raises
+
+from aiolxd.core.streams import WebsocketReader
+from aiolxd.core.streams import WebsocketWriter
+
+
+@mark.asyncio
+async def test_reader_read():
+    """Checks reader read methods."""
+    reader = WebsocketReader()
+    await reader.feed(b'line 1\nline 2\nend')
+    reader.feed_eof()
+
+    assert await reader.readline() == b'line 1\n'
+    assert await reader.readexactly(3) == b'lin'
+    assert await reader.read(2) == b'e '
+    assert [it async for it in reader] == [b'2\n', b'end']
+    assert reader.at_eof()
+    assert await reader.read() == b''
+
+    with raises(IncompleteReadError):
+        await reader.readexactly(1)
+
+
+@mark.asyncio
+async def test_reader_backpressure():
+    """Checks feed waits when the reader buffer is full."""
+    reader = WebsocketReader(limit=4)
+    await reader.feed(b'1234')
+    feed = ensure_future(reader.feed(b'5678'))
+    await sleep(0)
+    assert not feed.done()
+
+    assert await reader.read(2) == b'12'
+    await feed
+    reader.feed_eof()
+    assert await reader.read() == b'345678'
+
+
+@mark.asyncio
+async def test_writer_drain():
+    """Checks drain sends partial frames, and waits for room."""
+    writer = WebsocketWriter(limit=4, flush_interval=60)
+    writer.write(b'123')
+    writer.write(bytearray(b'456'))
+    drain = ensure_future(writer.drain())
+    await sleep(0)
+    assert not drain.done()
+
+    # Data is accounted as sent when the next frame is requested.
+    chunks = writer.chunks()
+    assert await chunks.__anext__() == b'123456'
+    writer.close()
+    assert [it async for it in chunks] == []
+    await drain
+    await writer.wait_closed()
+
+
+@mark.asyncio
+async def test_writer_frames():
+    """Checks small writes are coalesced, and big ones sliced."""
+    writer = WebsocketWriter(limit=64, frame_size=4, flush_interval=60)
+    for data in [b'1', b'23', b'456', memoryview(b'789abcdef')]:
+        writer.write(data)
+    writer.close()
+
+    frames = [bytes(it) async for it in writer.chunks()]
+    assert frames == [b'1234', b'5678', b'9abc', b'def']
+
+
+@mark.asyncio
+async def test_writer_reused_buffer():
+    """Checks mutable buffers can be reused as soon as write returns."""
+    writer = WebsocketWriter(limit=64, frame_size=4, flush_interval=60)
+    buffer = bytearray()
+    for data in [b'AAAA', b'BBBB', b'CC']:
+        buffer[:] = data
+        writer.write(buffer)
+    writer.close()
+
+    frames = [bytes(it) async for it in writer.chunks()]
+    assert frames == [b'AAAA', b'BBBB', b'CC']
+
+
+@mark.asyncio
+async def test_writer_flush_interval():
+    """Checks partial frames are sent after flush_interval."""
+    writer = WebsocketWriter(flush_interval=0.01)
+    writer.write(b'123')
+    chunks = writer.chunks()
+    assert await chunks.__anext__() == b'123'
+    writer.close()
+    assert [it async for it in chunks] == []
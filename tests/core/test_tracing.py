@@ -0,0 +1,68 @@
+"""Tracing unit tests."""
+from pytest import mark
+
+from aiolxd.core.operation import Operation
+from aiolxd.core.tracing import Histogram
+from aiolxd.core.tracing import Tracer
+from aiolxd.core.tracing import get_endpoint
+
+
+def test_get_endpoint():
+    """Checks object names are replaced in endpoint templates."""
+    assert get_endpoint('/1.0') == '/1.0'
+    assert get_endpoint('/1.0/containers?recursion=1') == '/1.0/containers'
+    assert get_endpoint('/1.0/containers/web1/state') == \
+        '/1.0/containers/{name}/state'
+    assert get_endpoint('/1.0/operations/id/wait') == \
+        '/1.0/operations/{name}/wait'
+
+
+def test_histogram():
+    """Checks values are counted in the right buckets."""
+    histogram = Histogram((0.1, 1.0))
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+    assert list(histogram.cumulative_counts()) == [
+        (0.1, 2), (1.0, 3), (float('inf'), 4)
+    ]
+    assert (histogram.count, histogram.sum) == (4, 2.65)
+
+
+@mark.parametrize('lxdclient', [{'tracer': Tracer()}], indirect=True)
+@mark.asyncio
+async def test_client_tracing(lxdclient, api_mock):
+    """Checks requests and operation steps are traced."""
+    spans = []
+    tracer = lxdclient.tracer
+    tracer.add_callback(spans.append)
+
+    api_mock('put', '/1.0/containers/web1/state', {'id': 'operation'}, False)
+    api_mock('get', '/1.0/operations/operation/wait', {'status': 'Success'})
+    await Operation(lxdclient, 'put', '/1.0/containers/web1/state', {})
+
+    assert [it.name for it in spans] == [
+        'http.request',
+        'operation.submit',
+        'http.request',
+        'operation.wait',
+    ]
+    assert spans[0].attributes['status'] == 200
+    assert spans[0].attributes['bytes_sent'] == 2
+    assert spans[0].attributes['bytes_received'] > 0
+
+    state = ('put', '/1.0/containers/{name}/state')
+    assert tracer.statuses[state + (200,)] == 1
+    assert tracer.bytes_sent[state] == 2
+    received = spans[0].attributes['bytes_received']
+    assert tracer.bytes_received[state] == received
+    assert tracer.histograms[('operation.wait',) + state].count == 1
+
+    metrics = tracer.prometheus()
+    assert (
+        'aiolxd_requests_total{method="get",'
+        'endpoint="/1.0/operations/{name}/wait",status="200"} 1'
+    ) in metrics
+    assert (
+        'aiolxd_duration_seconds_count{span="http.request",method="put",'
+        'endpoint="/1.0/containers/{name}/state"} 1'
+    ) in metrics
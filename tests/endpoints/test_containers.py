@@ -1,5 +1,8 @@
 """Certificates LXD endpoint unit tests."""
 from asyncio import Future
+from asyncio import gather
+from asyncio import sleep
+from asyncio import wait_for
 from typing import Dict
 from typing import Awaitable
 
@@ -9,6 +12,9 @@ from aiohttp.web import BaseRequest
 from aiohttp import WSMsgType
 
 from aiolxd import Client
+from aiolxd.core.scheduler import BULK
+from aiolxd.core.scheduler import NORMAL
+from aiolxd.core.scheduler import PriorityScheduler
 
 from tests.helpers import ApiMock
 
@@ -42,6 +48,30 @@ async def test_container_exec(lxdclient, api_mock):
             }
 
 
+@mark.parametrize(
+    'lxdclient',
+    [{'scheduler': PriorityScheduler()}],
+    indirect=True
+)
+@mark.asyncio
+async def test_container_exec_priority(lxdclient, api_mock):
+    """Check the exec priority schedules the request, without being sent."""
+    api_mock('get', '/1.0/containers', ['/1.0/containers/test'])
+    api_mock('get', '/1.0/containers/test', {})
+
+    data = {}
+    api_mock('post', '/1.0/containers/test/exec', data.update)
+
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            operation = test.exec(['dummy', 'command'], priority=BULK)
+            await operation
+
+    assert 'priority' not in data
+    assert data['command'] == ['dummy', 'command']
+    assert lxdclient.scheduler.served == {NORMAL: 2, BULK: 1}
+
+
 @mark.asyncio
 async def test_container_exec_websockets(lxdclient, api_mock):
     """Check that exec stdin / stdout / stderr websockets."""
@@ -87,7 +117,187 @@ async def test_container_exec_partial_websockets(
             )
 
 
-def _mock_exec_websockets(api_mock):
+@mark.asyncio
+async def test_container_spawn(lxdclient, api_mock):
+    """Check exec standard streams can be used as stream objects."""
+    _mock_exec_websockets(api_mock)
+
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            process = await test.spawn(['dummy', 'command'], limit=4)
+            process.stdin.write(b'stdin_data')
+            await process.stdin.drain()
+            process.stdin.close()
+
+            (stdout, stderr) = await gather(
+                process.stdout.read(),
+                process.stderr.read()
+            )
+            assert stdout == b'stdout_datastdout_data'
+            assert stderr == b'stderr_datastderr_data'
+            assert await process.wait() == 0
+            assert process.returncode == 0
+
+
+@mark.asyncio
+async def test_container_spawn_exit_with_open_stdin(lxdclient, api_mock):
+    """Check the process terminates if the command exits before stdin EOF."""
+    _mock_exec_websockets(api_mock, read_stdin=False)
+
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            process = await test.spawn(['dummy', 'command'])
+            process.stdin.write(b'stdin_data')
+
+            (stdout, _) = await gather(
+                process.stdout.read(),
+                process.stderr.read()
+            )
+            assert stdout == b'stdout_datastdout_data'
+            assert await wait_for(process.wait(), 5) == 0
+            assert process.stdin.is_closing()
+            # Like with a pipe, data written after the exit is dropped.
+            process.stdin.write(b'stdin_data')
+            await process.stdin.drain()
+
+
+@mark.asyncio
+async def test_container_exec_record_output(lxdclient, api_mock):
+    """Check exec with recorded output, read from LXD log files."""
+    api_mock('get', '/1.0/containers', ['/1.0/containers/test'])
+    api_mock('get', '/1.0/containers/test', {})
+
+    data = {}
+
+    def _exec(request_data):
+        data.update(request_data)
+        return {'id': 'test_exec'}
+
+    api_mock('post', '/1.0/containers/test/exec', _exec, False)
+    logs_url = '/1.0/containers/test/logs/exec_test'
+    api_mock('get', '/1.0/operations/test_exec/wait', {
+        'id': 'test_exec',
+        'metadata': {
+            'return': 2,
+            'output': {
+                '1': '%s.stdout' % logs_url,
+                '2': '%s.stderr' % logs_url,
+            },
+        },
+    })
+    api_mock.raw_handler('%s.stdout' % logs_url, 'get', 'stdout_data')
+
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            operation = test.exec(['dummy', 'command'], record_output=True)
+            await operation
+            assert data['record-output']
+            assert not data['wait-for-websocket']
+            assert operation.return_code == 2
+
+            chunks = [it async for it in operation.stdout_log(chunk_size=4)]
+            assert chunks[0] == b'stdo'
+            assert b''.join(chunks) == b'stdout_data'
+
+
+@mark.asyncio
+async def test_containers_exec_many(lxdclient, api_mock):
+    """Check running a command on several containers."""
+    names = ['c1', 'c2', 'c3', 'slow']
+    urls = ['/1.0/containers/%s' % it for it in names]
+    api_mock('get', '/1.0/containers', urls)
+    running = {'current': 0, 'max': 0}
+
+    def _mock_container(name, return_code, delay):
+        async def _wait(_):
+            running['current'] = running['current'] + 1
+            running['max'] = max(running['max'], running['current'])
+            await sleep(delay)
+            running['current'] = running['current'] - 1
+            return {'id': name, 'metadata': {'return': return_code}}
+
+        exec_url = '/1.0/containers/%s/exec' % name
+        api_mock('post', exec_url, {'id': name}, False)
+        api_mock('get', '/1.0/operations/%s/wait' % name, _wait)
+
+    _mock_container('c1', 0, 0.01)
+    _mock_container('c2', 1, 0.01)
+    _mock_container('c3', 0, 0.01)
+    _mock_container('slow', 0, 0.3)
+
+    async with lxdclient.api.containers as containers:
+        run = containers.exec_many(['uptime'], concurrency=2, timeout=0.1)
+        results = {it.name: it async for it in run}
+
+    assert set(results) == set(names)
+    assert results['c2'].return_code == 1
+    assert results['slow'].timed_out
+    assert running['max'] == 2
+
+    summary = run.summary
+    assert summary.return_codes == {0: 2, 1: 1}
+    assert [it.name for it in summary.succeeded] == ['c1', 'c3']
+    assert len(summary.failed) == 2
+    assert len(summary.timed_out) == 1
+    assert summary.max_duration >= 0.1
+
+
+@mark.asyncio
+async def test_containers_exec_many_timeout_websockets(lxdclient, api_mock):
+    """Check websockets of timed out commands are closed."""
+    api_mock('get', '/1.0/containers', ['/1.0/containers/test'])
+    api_mock('post', '/1.0/containers/test/exec', {
+        'id': 'test_exec',
+        'fds': {
+            '0': 'stdin_secret',
+            '1': 'stdout_secret',
+            '2': 'stderr_secret',
+            'control': 'control_secret',
+        }
+    }, False)
+
+    closed = []
+    all_closed = Future()
+    done = Future()
+
+    async def _ws_handler(request: BaseRequest) -> WebSocketResponse:
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        await socket.send_bytes(b'data')
+        while not socket.closed:
+            await socket.receive()
+        closed.append(request.query['secret'])
+        if len(closed) == 4:
+            all_closed.set_result(None)
+        return socket
+
+    async def _wait_handler(_: Dict[str, object]) -> Dict[str, object]:
+        await done
+        return {}
+
+    api_mock('get', '/1.0/operations/test_exec/wait', _wait_handler)
+    for secret in ['stdin', 'stdout', 'stderr', 'control']:
+        api_mock.raw_handler(
+            '/1.0/operations/test_exec/websocket?secret=%s_secret' % secret,
+            'get',
+            _ws_handler,
+            match_querystring=True
+        )
+
+    async with lxdclient.api.containers as containers:
+        run = containers.exec_many(
+            ['sleep', '60'],
+            timeout=0.1,
+            capture_output=True
+        )
+        summary = await run.wait()
+
+    done.set_result(None)
+    assert len(summary.timed_out) == 1
+    await wait_for(all_closed, 1)
+
+
+def _mock_exec_websockets(api_mock, read_stdin=True):
     api_mock('get', '/1.0/containers', ['/1.0/containers/test'])
     api_mock('get', '/1.0/containers/test', {})
 
@@ -113,17 +323,22 @@ def _mock_exec_websockets(api_mock):
         socket = WebSocketResponse()
         await socket.prepare(request)
 
-        if secret == 'stdin_secret':
+        if secret == 'stdin_secret' and not read_stdin:
+            # The command exits without waiting for stdin to be closed.
+            pass
+        elif secret == 'stdin_secret':
+            # Stdin writes may be coalesced in a single message.
+            data = b''
             message = await socket.receive()
-            message_type = message.type
-            assert message_type in [
-                WSMsgType.BINARY,
+            while message.type == WSMsgType.BINARY:
+                data = data + message.data
+                message = await socket.receive()
+            assert message.type in [
                 WSMsgType.CLOSE,
                 WSMsgType.CLOSED,
                 WSMsgType.CLOSING,
             ]
-            if message_type == WSMsgType.BINARY:
-                assert message.data.decode('utf-8') == 'stdin_data'
+            assert not data.replace(b'stdin_data', b'')
         elif secret == 'stdout_secret':
             await socket.send_bytes('stdout_data'.encode('utf-8'))
             await socket.send_str('stdout_data')
@@ -142,7 +357,7 @@ def _mock_exec_websockets(api_mock):
         for socket in websockets:
             await socket.close()
 
-        return {}
+        return {'id': operation_id, 'metadata': {'return': 0}}
 
     api_mock('get', '{}/wait'.format(operation_url), _wait_handler)
 
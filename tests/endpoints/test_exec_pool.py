@@ -0,0 +1,211 @@
+"""Exec session pool unit tests."""
+from asyncio import Future
+from asyncio import Queue
+from asyncio import ensure_future
+from asyncio import sleep
+from asyncio import TimeoutError  # pylint: disable=redefined-builtin
+from asyncio import gather
+from asyncio import wait_for
+from re import compile as compile_regex
+
+from aiohttp import ClientResponseError
+from aiohttp import WSMsgType
+from aiohttp.web import Response
+from aiohttp.web import WebSocketResponse
+from pytest import mark
+from pytest import raises
+
+from aiolxd.end_points.exec_pool import ExecSessionPool
+from aiolxd.end_points.exec_pool import SessionError
+
+_SCRIPT_REGEX = compile_regex(
+    rb"eval '(.*)' </dev/null 2>/dev/null\n"
+    rb"printf '\\n%s %d\\n' '(\w+)' \"\$\?\"\n"
+)
+
+
+@mark.asyncio
+async def test_exec_pool_run(lxdclient, api_mock):
+    """Check commands are run through a single shell per container."""
+    _mock_shell(api_mock, 'test')
+
+    async with ExecSessionPool(lxdclient) as pool:
+        result = await pool.run('/1.0/containers/test', 'echo hello')
+        assert (result.stdout, result.return_code) == (b'hello\n', 0)
+
+        result = await pool.run('/1.0/containers/test', "echo 'quoted'")
+        assert (result.stdout, result.return_code) == (b"'quoted'\n", 0)
+
+        result = await pool.run('/1.0/containers/test', 'false')
+        assert (result.stdout, result.return_code) == (b'', 1)
+        assert len(pool) == 1
+
+
+@mark.asyncio
+async def test_exec_pool_max_size(lxdclient, api_mock):
+    """Check least recently used sessions are closed when the pool is full."""
+    first_closed = _mock_shell(api_mock, 'first')
+    _mock_shell(api_mock, 'second')
+
+    async with ExecSessionPool(lxdclient, max_size=1) as pool:
+        await pool.run('/1.0/containers/first', 'echo first')
+        result = await pool.run('/1.0/containers/second', 'echo second')
+        assert result.stdout == b'second\n'
+        assert first_closed.done()
+        assert len(pool) == 1
+
+
+@mark.asyncio
+async def test_exec_pool_evict_busy(lxdclient, api_mock):
+    """Check evicting a busy session doesn't wait for its command."""
+    first_closed = _mock_shell(api_mock, 'first')
+    _mock_shell(api_mock, 'second')
+
+    async with ExecSessionPool(lxdclient, max_size=1) as pool:
+        busy = ensure_future(pool.run('/1.0/containers/first', 'sleep'))
+        await sleep(0.05)
+        result = await wait_for(
+            pool.run('/1.0/containers/second', 'echo second'),
+            1
+        )
+        assert result.stdout == b'second\n'
+        assert not first_closed.done()
+        busy.cancel()
+
+    assert first_closed.done()
+
+
+@mark.asyncio
+async def test_exec_pool_exec_error(lxdclient, api_mock):
+    """Check exec request failures are chained to the session error."""
+    api_mock.raw_handler(
+        '/1.0/containers/missing/exec',
+        'post',
+        Response(status=404, text='not found')
+    )
+
+    async with ExecSessionPool(lxdclient) as pool:
+        with raises(SessionError) as error:
+            await pool.run('/1.0/containers/missing', 'echo missing')
+        assert isinstance(error.value.__cause__, ClientResponseError)
+
+
+@mark.asyncio
+async def test_exec_pool_cancelled_run(lxdclient, api_mock):
+    """Check a session is replaced when a command is interrupted."""
+    first_closed = _mock_shell(api_mock, 'test')
+    _mock_shell(api_mock, 'test', 1)
+
+    async with ExecSessionPool(lxdclient) as pool:
+        with raises(TimeoutError):
+            await wait_for(pool.run('/1.0/containers/test', 'sleep'), 0.05)
+        assert len(pool) == 0
+
+        # Output of the interrupted command must not be read.
+        result = await pool.run('/1.0/containers/test', 'echo next')
+        assert result.stdout == b'next\n'
+        await wait_for(first_closed, 1)
+
+
+@mark.asyncio
+async def test_exec_pool_shell_exit(lxdclient, api_mock):
+    """Check a session whose shell exited is closed and removed."""
+    closed = _mock_shell(api_mock, 'test')
+
+    async with ExecSessionPool(lxdclient) as pool:
+        with raises(SessionError):
+            await pool.run('/1.0/containers/test', 'exit')
+        assert len(pool) == 0
+        await wait_for(closed, 1)
+
+
+@mark.asyncio
+async def test_exec_pool_concurrent_runs(lxdclient, api_mock):
+    """Check concurrent runs on a new container share a single session."""
+    _mock_shell(api_mock, 'first')
+    _mock_shell(api_mock, 'second')
+
+    async with ExecSessionPool(lxdclient, max_size=1) as pool:
+        await pool.run('/1.0/containers/first', 'echo first')
+        results = await gather(
+            pool.run('/1.0/containers/second', 'echo 1'),
+            pool.run('/1.0/containers/second', 'echo 2')
+        )
+        assert [it.stdout for it in results] == [b'1\n', b'2\n']
+        assert len(pool) == 1
+
+
+def _mock_shell(api_mock, name, index=0):
+    """Mock an exec of a shell running echo, false, sleep and exit commands.
+
+    sleep never terminates, and exit terminates the shell.
+    """
+    operation_id = 'shell_%s_%d' % (name, index)
+    api_mock('post', '/1.0/containers/%s/exec' % name, {
+        'id': operation_id,
+        'fds': {
+            '0': 'stdin_secret',
+            '1': 'stdout_secret',
+            '2': 'stderr_secret',
+            'control': 'control_secret',
+        }
+    }, False)
+
+    output = Queue()
+    websockets = []
+    closed = Future()
+
+    async def _ws_handler(request):
+        secret = request.query['secret']
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        websockets.append(socket)
+
+        if secret == 'stdin_secret':
+            script = b''
+            message = await socket.receive()
+            while message.type == WSMsgType.BINARY:
+                script = script + message.data
+                for match in _SCRIPT_REGEX.finditer(script):
+                    output.put_nowait(_run(*match.groups()))
+                    script = script[match.end():]
+                message = await socket.receive()
+            output.put_nowait(None)
+        elif secret == 'stdout_secret':
+            data = await output.get()
+            while data is not None:
+                if data:
+                    await socket.send_bytes(data)
+                data = await output.get()
+            closed.set_result(None)
+
+        return socket
+
+    async def _wait_handler(_):
+        await closed
+        for socket in websockets:
+            await socket.close()
+        return {'id': operation_id, 'metadata': {'return': 0}}
+
+    operation_url = '/1.0/operations/%s' % operation_id
+    api_mock('get', '%s/wait' % operation_url, _wait_handler)
+    for secret in ['stdin', 'stdout', 'stderr', 'control']:
+        url = '%s/websocket?secret=%s_secret' % (operation_url, secret)
+        api_mock.raw_handler(url, 'get', _ws_handler, match_querystring=True)
+
+    return closed
+
+
+def _run(command, marker):
+    command = command.replace(b"'\\''", b"'")
+    if command == b'exit':
+        return None
+    if command == b'sleep':
+        return b''
+    if command == b'false':
+        (stdout, return_code) = (b'', 1)
+    else:
+        assert command.startswith(b'echo ')
+        (stdout, return_code) = (command[5:] + b'\n', 0)
+
+    return stdout + b'\n' + marker + b' %d\n' % return_code
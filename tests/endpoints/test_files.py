@@ -0,0 +1,83 @@
+"""Container files LXD endpoint unit tests."""
+from aiohttp.web import json_response
+from pytest import mark
+
+from aiolxd.end_points.files import Files
+
+_FILE_URL = '/1.0/containers/test/files?path=/etc/app.conf'
+
+
+def _mock_push(api_mock):
+    received = {}
+
+    async def _handler(request):
+        received['headers'] = request.headers
+        received['body'] = await request.read()
+        return json_response({'type': 'sync', 'metadata': {}})
+
+    api_mock.raw_handler(_FILE_URL, 'post', _handler, match_querystring=True)
+    return received
+
+
+@mark.asyncio
+async def test_files_push_path(lxdclient, api_mock, tmp_path):
+    """Check pushing a local file, with its owner and mode."""
+    received = _mock_push(api_mock)
+    source = tmp_path / 'app.conf'
+    source.write_bytes(b'0123456789' * 10)
+
+    files = Files(lxdclient, '/1.0/containers/test', chunk_size=16)
+    await files.push('/etc/app.conf', source, uid=1000, gid=100, mode=0o640)
+
+    assert received['body'] == b'0123456789' * 10
+    headers = received['headers']
+    assert headers['X-LXD-uid'] == '1000'
+    assert headers['X-LXD-gid'] == '100'
+    assert headers['X-LXD-mode'] == '0640'
+    assert headers['X-LXD-type'] == 'file'
+
+
+@mark.asyncio
+async def test_files_push_iterator(lxdclient, api_mock, tmp_path):
+    """Check pushing data yielded by an async iterator, and empty files."""
+    received = _mock_push(api_mock)
+
+    async def _source():
+        yield b'first '
+        yield memoryview(b'second')
+
+    files = Files(lxdclient, '/1.0/containers/test')
+    await files.push('/etc/app.conf', _source())
+    assert received['body'] == b'first second'
+
+    received = _mock_push(api_mock)
+    source = tmp_path / 'empty'
+    source.touch()
+    await files.push('/etc/app.conf', source)
+    assert received['body'] == b''
+
+
+@mark.asyncio
+async def test_files_pull(lxdclient, api_mock, tmp_path):
+    """Check pulling a file to a local path and to an async function."""
+    for _ in range(2):
+        api_mock.raw_handler(
+            _FILE_URL,
+            'get',
+            'file_content',
+            match_querystring=True
+        )
+
+    files = Files(lxdclient, '/1.0/containers/test', chunk_size=4)
+    target = tmp_path / 'app.conf'
+    await files.pull('/etc/app.conf', target)
+    assert target.read_bytes() == b'file_content'
+
+    chunks = []
+
+    async def _sink(chunk):
+        chunks.append(chunk)
+
+    await files.pull('/etc/app.conf', _sink)
+    assert chunks[0] == b'file'
+    assert b''.join(chunks) == b'file_content'
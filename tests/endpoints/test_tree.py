@@ -0,0 +1,184 @@
+"""Directory tree transfers unit tests."""
+from asyncio import Future
+from io import BytesIO
+import tarfile
+
+from aiohttp import WSMsgType
+from aiohttp.web import WebSocketResponse
+from pytest import mark
+from pytest import raises
+
+from aiolxd.end_points import tree
+from aiolxd.end_points.tree import TransferError
+
+
+@mark.asyncio
+async def test_push_tree(lxdclient, api_mock, tmp_path):
+    """Check a directory is pushed as a tar archive on tar stdin."""
+    tar = _mock_tar(api_mock)
+    local_dir = tmp_path / 'tree'
+    (local_dir / 'sub').mkdir(parents=True)
+    for index in range(10):
+        (local_dir / 'sub' / str(index)).write_text('content %d' % index)
+
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            stats = await test.push_tree(local_dir, '/srv', compress=True)
+
+    assert tar['command'] == ['tar', '-x', '-C', '/srv', '-f', '-', '-z']
+    assert stats.bytes == len(tar['stdin'])
+    assert stats.bytes_per_second > 0
+
+    archive = tarfile.open(fileobj=BytesIO(tar['stdin']), mode='r:gz')
+    content = archive.extractfile('./sub/3').read()
+    assert content == b'content 3'
+
+
+@mark.asyncio
+async def test_pull_tree(lxdclient, api_mock, tmp_path):
+    """Check a directory is pulled from tar stdout."""
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    (source_dir / 'file').write_bytes(b'x' * 100000)
+    archive = BytesIO()
+    with tarfile.open(fileobj=archive, mode='w|') as writer:
+        writer.add(str(source_dir), arcname='.')
+    tar = _mock_tar(api_mock, stdout=archive.getvalue())
+
+    local_dir = tmp_path / 'target'
+    local_dir.mkdir()
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            stats = await test.pull_tree('/srv', local_dir)
+
+    assert tar['command'] == ['tar', '-c', '-C', '/srv', '-f', '-', '.']
+    assert (local_dir / 'file').read_bytes() == b'x' * 100000
+    assert stats.bytes == len(archive.getvalue())
+
+
+@mark.parametrize('filters', [True, False])
+@mark.parametrize('name,link', [
+    ('../outside', None),
+    ('./link', '../outside'),
+    ('./link', '/outside'),
+])
+@mark.asyncio
+# pylint: disable=too-many-arguments
+async def test_pull_tree_unsafe(lxdclient, api_mock, tmp_path, monkeypatch,
+                                filters, name, link):
+    """Check members written outside the target directory are refused."""
+    if not filters:
+        monkeypatch.delattr(tarfile, 'data_filter', raising=False)
+
+    archive = BytesIO()
+    with tarfile.open(fileobj=archive, mode='w|') as writer:
+        member = tarfile.TarInfo(name)
+        if link is not None:
+            member.type = tarfile.SYMTYPE
+            member.linkname = link
+        writer.addfile(member, BytesIO())
+    _mock_tar(api_mock, stdout=archive.getvalue())
+
+    local_dir = tmp_path / 'target'
+    local_dir.mkdir()
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            with raises(tarfile.TarError):
+                await test.pull_tree('/srv', local_dir)
+
+    assert not (tmp_path / 'outside').exists()
+    assert not (local_dir / 'link').exists()
+
+
+@mark.asyncio
+async def test_push_tree_error(lxdclient, api_mock, tmp_path):
+    """Check a tar failure raises a TransferError."""
+    _mock_tar(api_mock, stderr=b'tar: /srv: No such file', return_code=2)
+
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            with raises(TransferError) as error:
+                await test.push_tree(tmp_path, '/srv')
+
+    assert error.value.return_code == 2
+    assert error.value.stderr == b'tar: /srv: No such file'
+
+
+@mark.asyncio
+async def test_push_tree_local_error(lxdclient, api_mock, tmp_path,
+                                     monkeypatch):
+    """Check tar still terminates when the local archive can't be written."""
+    tar = _mock_tar(api_mock, return_code=2)
+
+    def _write_archive(*_):
+        raise PermissionError('unreadable')
+
+    monkeypatch.setattr(tree, '_write_archive', _write_archive)
+    async with lxdclient.api.containers as containers:
+        async with containers['test'] as test:
+            with raises(PermissionError):
+                await test.push_tree(tmp_path, '/srv')
+
+    assert tar['finished'] == 4
+
+
+def _mock_tar(api_mock, stdout=b'', stderr=b'', return_code=0):
+    """Mock a tar exec, recording its command and standard input."""
+    api_mock('get', '/1.0/containers', ['/1.0/containers/test'])
+    api_mock('get', '/1.0/containers/test', {})
+
+    tar = {'stdin': b''}
+    operation_id = 'tar'
+
+    def _exec(data):
+        tar['command'] = data['command']
+        return {
+            'id': operation_id,
+            'fds': {
+                '0': 'stdin_secret',
+                '1': 'stdout_secret',
+                '2': 'stderr_secret',
+                'control': 'control_secret',
+            }
+        }
+
+    api_mock('post', '/1.0/containers/test/exec', _exec, False)
+
+    websockets = []
+    done = Future()
+
+    async def _ws_handler(request):
+        secret = request.query['secret']
+        socket = WebSocketResponse()
+        await socket.prepare(request)
+        websockets.append(socket)
+
+        if secret == 'stdin_secret':
+            message = await socket.receive()
+            while message.type == WSMsgType.BINARY:
+                tar['stdin'] = tar['stdin'] + message.data
+                message = await socket.receive()
+        elif secret == 'stdout_secret':
+            for offset in range(0, len(stdout), 1000):
+                await socket.send_bytes(stdout[offset:offset + 1000])
+        elif secret == 'stderr_secret' and stderr:
+            await socket.send_bytes(stderr)
+
+        tar['finished'] = tar.get('finished', 0) + 1
+        if tar['finished'] == 4:
+            done.set_result(None)
+        return socket
+
+    async def _wait_handler(_):
+        await done
+        for socket in websockets:
+            await socket.close()
+        return {'id': operation_id, 'metadata': {'return': return_code}}
+
+    operation_url = '/1.0/operations/%s' % operation_id
+    api_mock('get', '%s/wait' % operation_url, _wait_handler)
+    for secret in ['stdin', 'stdout', 'stderr', 'control']:
+        url = '%s/websocket?secret=%s_secret' % (operation_url, secret)
+        api_mock.raw_handler(url, 'get', _ws_handler, match_querystring=True)
+
+    return tar
@@ -8,6 +8,7 @@ from typing import Union
 
 from aresponses import ResponsesMockServer
 
+from pytest import FixtureRequest
 from pytest import fixture
 from pytest import mark
 
@@ -35,13 +36,27 @@ def datadir() -> Path:
 @fixture # type: ignore
 @mark.asyncio # type: ignore
 # pylint: disable=redefined-outer-name
-async def lxdclient(datadir: Path) -> Client:
-    """Fixture returning a correctly initalized aiolxd client."""
+async def lxdclient(
+    request: FixtureRequest,
+    datadir: Path,
+    aresponses: ResponsesMockServer  # pylint: disable=unused-argument
+) -> Client:
+    """Fixture returning a correctly initalized aiolxd client.
+
+    The client is closed before the mock server, so websockets opened by the
+    client don't hold the server shutdown.
+
+    Additional Client arguments can be given through indirect
+    parametrization, i.e :
+    @mark.parametrize('lxdclient', [{'tracer': Tracer()}], indirect=True)
+    """
+    kwargs = getattr(request, 'param', {})
     async with Client(
             verify_host_certificate=False,
             base_url='http://' + _MOCK_HOST,
             client_cert=datadir / 'client.crt',
             client_key=datadir / 'client.key',
+            **kwargs
     ) as client:
         yield client
 